@@ -0,0 +1,81 @@
+import hashlib
+import json
+import math
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Lokalny zamiennik API OpenAI do benchmarków: deterministyczne opisy i embeddingi
+# z konfigurowalnym opóźnieniem, bez kosztów i bez sieci.
+WORDS = [
+    "kot", "pies", "morze", "góry", "las", "plaża", "miasto", "samochód", "rower", "dziecko",
+    "zachód", "słońca", "śnieg", "kwiaty", "jezioro", "most", "dom", "ulica", "niebo", "chmury",
+]
+DEFAULT_DIMENSIONS = 3072
+
+
+def fake_caption(content):
+    rng = random.Random(hashlib.sha256(content.encode("utf-8")).digest())
+    return " ".join(rng.sample(WORDS, 4))
+
+
+def fake_embedding(text, dimensions=DEFAULT_DIMENSIONS):
+    rng = random.Random(hashlib.sha256(text.encode("utf-8")).digest())
+    vector = [rng.gauss(0.0, 1.0) for _ in range(dimensions)]
+    norm = math.sqrt(sum(value * value for value in vector))
+    return [value / norm for value in vector]
+
+
+class FakeOpenAIHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def _reply(self, body):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        request = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        if self.path.endswith("/chat/completions"):
+            time.sleep(self.server.caption_latency)
+            content = json.dumps(request["messages"])
+            caption = fake_caption(content)
+            self._reply({
+                "id": "chatcmpl-fake",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": request["model"],
+                "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": caption}}],
+                "usage": {"prompt_tokens": len(content) // 4, "completion_tokens": 8, "total_tokens": len(content) // 4 + 8},
+            })
+        elif self.path.endswith("/embeddings"):
+            time.sleep(self.server.embedding_latency)
+            texts = request["input"] if isinstance(request["input"], list) else [request["input"]]
+            dimensions = request.get("dimensions") or DEFAULT_DIMENSIONS
+            tokens = sum(len(text.split()) for text in texts)
+            self._reply({
+                "object": "list",
+                "model": request["model"],
+                "data": [
+                    {"object": "embedding", "index": i, "embedding": fake_embedding(text, dimensions)}
+                    for i, text in enumerate(texts)
+                ],
+                "usage": {"prompt_tokens": tokens, "total_tokens": tokens},
+            })
+        else:
+            self.send_error(404)
+
+
+def start_fake_openai(caption_latency=0.0, embedding_latency=0.0):
+    # Uruchamia serwer w wątku na wolnym porcie; zwraca (serwer, base_url dla openai.OpenAI)
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeOpenAIHandler)
+    server.daemon_threads = True
+    server.caption_latency = caption_latency
+    server.embedding_latency = embedding_latency
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/v1"
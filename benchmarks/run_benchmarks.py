@@ -0,0 +1,224 @@
+import argparse
+import io
+import json
+import multiprocessing
+import platform
+import random
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import warnings
+
+from PIL import Image, ImageDraw
+from qdrant_client import QdrantClient
+
+from benchmarks.fake_openai import WORDS, start_fake_openai
+from blobstore import LocalBlobStore
+from captioning import caption_images, describe_image
+from clients import create_openai_client
+from gallery import GalleryPager
+from ingest import build_note_payload, bulk_add_notes, embed_texts
+from lexical import BM25Index
+from profiles import COLLECTION_PROFILES, create_collection, get_profile, search_params
+
+# Benchmark bez płatnych API: lokalny serwer udający OpenAI i lokalny Qdrant.
+# Uruchomienie z katalogu głównego repozytorium:
+#   python -m benchmarks.run_benchmarks --sizes 100,1000 --output wyniki.json
+EMBEDDING_MODEL = "text-embedding-3-large"
+COLLECTION_NAME = "bench"
+INGEST_CHUNK = 64
+IMAGE_SIZE = (800, 600)
+# Moduły importowane przez aplikację przed narysowaniem pierwszego ekranu
+APP_MODULES = ("streamlit", "blobstore", "cache", "captioning", "clients", "core", "gallery", "ingest", "jobs", "lexical", "metrics", "profiles", "search", "ui")
+STARTUP_RUNS = 5
+
+
+def synthetic_images(count, seed=0):
+    # Deterministyczne, różne od siebie zdjęcia generowane na bieżąco (bez trzymania całości w pamięci)
+    rng = random.Random(seed)
+    for i in range(count):
+        image = Image.new("RGB", IMAGE_SIZE, tuple(rng.randrange(256) for _ in range(3)))
+        draw = ImageDraw.Draw(image)
+        for _ in range(12):
+            x, y = rng.randrange(IMAGE_SIZE[0]), rng.randrange(IMAGE_SIZE[1])
+            draw.rectangle([x, y, x + rng.randrange(20, 200), y + rng.randrange(20, 200)], fill=tuple(rng.randrange(256) for _ in range(3)))
+        output = io.BytesIO()
+        image.save(output, "JPEG", quality=85)
+        yield f"img_{i:06d}.jpg", output.getvalue(), "image/jpeg"
+
+
+def percentiles(samples):
+    if not samples:
+        return {}
+    ordered = sorted(samples)
+
+    def at(fraction):
+        return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))] * 1000
+
+    return {"p50_ms": at(0.50), "p95_ms": at(0.95), "p99_ms": at(0.99), "count": len(ordered)}
+
+
+def _chunks(iterable, size):
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def bench_ingest(client, qdrant_client, blob_store, profile, size, workers):
+    started_at = time.perf_counter()
+    saved_total = 0
+    for chunk in _chunks(synthetic_images(size), INGEST_CHUNK):
+        descriptions, _ = caption_images(
+            lambda bytes_data, mime_type: describe_image(client, bytes_data),
+            chunk,
+            max_workers=workers,
+            requests_per_minute=10 ** 6,
+        )
+        notes = [
+            (name, build_note_payload(descriptions[name], bytes_data, mime_type, blob_store))
+            for name, bytes_data, mime_type in chunk
+            if name in descriptions
+        ]
+        saved, _ = bulk_add_notes(qdrant_client, COLLECTION_NAME, client, notes, EMBEDDING_MODEL, dimensions=profile["dimensions"])
+        saved_total += len(saved)
+    elapsed = time.perf_counter() - started_at
+    return {"images": saved_total, "seconds": elapsed, "images_per_second": saved_total / elapsed if elapsed else 0.0}
+
+
+def bench_search(client, qdrant_client, profile, queries):
+    lexical_index = BM25Index.from_collection(qdrant_client, COLLECTION_NAME)
+    dense, keyword = [], []
+    for query in queries:
+        started_at = time.perf_counter()
+        vector = embed_texts(client, [query], EMBEDDING_MODEL, dimensions=profile["dimensions"])[0]
+        qdrant_client.query_points(
+            collection_name=COLLECTION_NAME,
+            query=vector,
+            limit=10,
+            with_payload=False,
+            search_params=search_params(profile),
+        )
+        dense.append(time.perf_counter() - started_at)
+
+        started_at = time.perf_counter()
+        lexical_index.search(query, 10)
+        keyword.append(time.perf_counter() - started_at)
+    return {"dense": percentiles(dense), "keyword": percentiles(keyword)}
+
+
+def bench_gallery(qdrant_client, blob_store, page_size):
+    # Pełna ścieżka strony galerii: metadane z Qdrant + miniatury z magazynu blobów
+    pager = GalleryPager(qdrant_client, COLLECTION_NAME, page_size=page_size)
+    samples = []
+    offset = None
+    while True:
+        started_at = time.perf_counter()
+        points, offset = pager.page(offset)
+        for point in points:
+            blob_store.get(point.payload["thumbnail_hash"])
+        samples.append(time.perf_counter() - started_at)
+        if offset is None:
+            return percentiles(samples)
+
+
+def bench_startup(runs=STARTUP_RUNS):
+    # Import modułów aplikacji w świeżym procesie - to blokuje pierwszy ekran po starcie serwera
+    code = (
+        "import time; started_at = time.perf_counter(); "
+        f"import {', '.join(APP_MODULES)}; "
+        "print(time.perf_counter() - started_at)"
+    )
+    samples = [float(subprocess.check_output([sys.executable, "-c", code], text=True)) for _ in range(runs)]
+    return {"app_imports_ms": statistics.median(samples) * 1000, "runs": runs}
+
+
+def run_size(client, profile, size, args):
+    with tempfile.TemporaryDirectory() as directory:
+        qdrant_client = QdrantClient(path=f"{directory}/qdrant") if args.on_disk else QdrantClient(location=":memory:")
+        blob_store = LocalBlobStore(f"{directory}/blobs")
+        create_collection(qdrant_client, COLLECTION_NAME, profile)
+
+        # tracemalloc wyraźnie spowalnia Pythona, więc jest opcjonalny
+        if args.trace_memory:
+            tracemalloc.start()
+        result = {"size": size}
+        result["ingest"] = bench_ingest(client, qdrant_client, blob_store, profile, size, args.workers)
+        rng = random.Random(size)
+        queries = [" ".join(rng.sample(WORDS, rng.randint(1, 3))) for _ in range(args.queries)]
+        result["search"] = bench_search(client, qdrant_client, profile, queries)
+        result["gallery_page"] = bench_gallery(qdrant_client, blob_store, args.page_size)
+        if args.trace_memory:
+            result["python_peak_memory_mb"] = tracemalloc.get_traced_memory()[1] / 2 ** 20
+            tracemalloc.stop()
+        result["process_peak_rss_mb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+        qdrant_client.close()
+    return result
+
+
+def run_size_in_process(base_url, size, args):
+    # ru_maxrss to szczyt całego procesu, więc każdy rozmiar mierzymy w świeżym procesie -
+    # inaczej kolejne rozmiary pokazywałyby maksimum z poprzednich
+    warnings.filterwarnings("ignore", message="Local mode performs exact")
+    client = create_openai_client("benchmark", base_url=base_url, max_connections=max(args.workers * 2, 10))
+    return run_size(client, get_profile(args.profile), size, args)
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], text=True, stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark zapisu, wyszukiwania i galerii na lokalnych zamiennikach OpenAI i Qdrant.")
+    parser.add_argument("--sizes", default="100,500,1000", help="Rozmiary zbiorów zdjęć, po przecinku")
+    parser.add_argument("--profile", default="full", choices=sorted(COLLECTION_PROFILES))
+    parser.add_argument("--caption-latency-ms", type=float, default=300.0)
+    parser.add_argument("--embedding-latency-ms", type=float, default=100.0)
+    parser.add_argument("--workers", type=int, default=8, help="Równoległe opisy")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--page-size", type=int, default=12)
+    parser.add_argument("--trace-memory", action="store_true", help="Szczytowa pamięć Pythona (tracemalloc) dla każdego rozmiaru")
+    parser.add_argument("--on-disk", action="store_true", help="Lokalny Qdrant na dysku zamiast w pamięci")
+    parser.add_argument("--output", help="Plik JSON z wynikami (domyślnie standardowe wyjście)")
+    args = parser.parse_args()
+
+    # Lokalny Qdrant i tak szuka dokładnie, parametry HNSW/kwantyzacji ma tylko serwer
+    warnings.filterwarnings("ignore", message="Local mode performs exact")
+    server, base_url = start_fake_openai(args.caption_latency_ms / 1000, args.embedding_latency_ms / 1000)
+
+    report = {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "config": {key: value for key, value in vars(args).items() if key != "output"},
+        "startup": bench_startup(),
+        "results": [],
+    }
+    context = multiprocessing.get_context("spawn")
+    for size in (int(value) for value in args.sizes.split(",")):
+        print(f"Rozmiar {size}...", file=sys.stderr)
+        with context.Pool(1) as pool:
+            report["results"].append(pool.apply(run_size_in_process, (base_url, size, args)))
+    server.shutdown()
+
+    output = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+import base64
+import hashlib
+import os
+import threading
+import uuid
+
+from profiles import is_local_client
+
+BLOB_DIR = "blobs"  # Katalog zdjęć przy lokalnej bazie Qdrant
+BLOB_COLLECTION_NAME = "note_blobs"  # Kolekcja zdjęć przy serwerze Qdrant
+
+
+def blob_hash(bytes_data):
+    return hashlib.sha256(bytes_data).hexdigest()
+
+
+class LocalBlobStore:
+    # Magazyn adresowany treścią: plik zapisany pod hashem SHA-256 swojej zawartości.
+    # Inny backend (np. S3) wystarczy, że udostępni te same metody: put, get, exists, delete.
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], key)
+
+    def put(self, bytes_data):
+        key = blob_hash(bytes_data)
+        path = self._path(key)
+        # Ta sama zawartość ma ten sam klucz, więc nie ma czego nadpisywać
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(bytes_data)
+            os.replace(tmp_path, path)
+        return key
+
+    def get(self, key):
+        try:
+            with open(self._path(key), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def exists(self, key):
+        return os.path.exists(self._path(key))
+
+    def delete(self, key):
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+
+class QdrantBlobStore:
+    # Zdjęcia w osobnej kolekcji Qdranta (bez wektorów, plik w payloadzie jako base64).
+    # Dla wdrożeń ze zdalnym Qdrantem, gdzie lokalny dysk znika przy każdym wdrożeniu
+    # (np. Streamlit Community Cloud). Te same metody co LocalBlobStore.
+    def __init__(self, qdrant_client, collection_name):
+        self.qdrant_client = qdrant_client
+        self.collection_name = collection_name
+        if not qdrant_client.collection_exists(collection_name):
+            qdrant_client.create_collection(collection_name=collection_name, vectors_config={})
+
+    def _point_id(self, key):
+        # Qdrant przyjmuje jako ID liczbę albo UUID - bierzemy pierwsze 128 bitów SHA-256
+        return str(uuid.UUID(key[:32]))
+
+    def put(self, bytes_data):
+        from qdrant_client.models import PointStruct
+
+        key = blob_hash(bytes_data)
+        if not self.exists(key):
+            self.qdrant_client.upsert(
+                collection_name=self.collection_name,
+                points=[PointStruct(
+                    id=self._point_id(key),
+                    vector={},
+                    payload={"key": key, "data": base64.b64encode(bytes_data).decode("ascii")},
+                )],
+                wait=True,
+            )
+        return key
+
+    def get(self, key):
+        points = self.qdrant_client.retrieve(self.collection_name, ids=[self._point_id(key)], with_payload=["data"])
+        if not points:
+            return None
+        return base64.b64decode(points[0].payload["data"])
+
+    def exists(self, key):
+        return bool(self.qdrant_client.retrieve(self.collection_name, ids=[self._point_id(key)], with_payload=False))
+
+    def delete(self, key):
+        from qdrant_client.models import PointIdsList
+
+        self.qdrant_client.delete(collection_name=self.collection_name, points_selector=PointIdsList(points=[self._point_id(key)]))
+
+
+def make_blob_store(qdrant_client, directory=BLOB_DIR, collection_name=BLOB_COLLECTION_NAME):
+    # Ten sam wybór w aplikacjach i narzędziach: przy lokalnej bazie zdjęcia leżą obok niej na dysku,
+    # przy serwerze - w osobnej kolekcji tego serwera, bo lokalny dysk (np. Streamlit Cloud) znika przy wdrożeniu
+    if is_local_client(qdrant_client):
+        return LocalBlobStore(directory)
+    return QdrantBlobStore(qdrant_client, collection_name)
+
+
+def copy_blobs(keys, source, target):
+    # Kopiuje zdjęcia między magazynami (np. do archiwum i z archiwum); pomija te, które cel już ma.
+    # Zwraca (liczba skopiowanych, klucze, których brakuje w źródle).
+    copied = 0
+    missing = []
+    for key in keys:
+        if target.exists(key):
+            continue
+        bytes_data = source.get(key)
+        if bytes_data is None:
+            missing.append(key)
+            continue
+        target.put(bytes_data)
+        copied += 1
+    return copied, missing
@@ -0,0 +1,279 @@
+import argparse
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from dotenv import dotenv_values
+
+from blobstore import BLOB_DIR, make_blob_store
+from cache import PersistentCache
+from captioning import (
+    DEFAULT_MAX_RETRIES,
+    DEFAULT_MAX_WORKERS,
+    DEFAULT_REQUESTS_PER_MINUTE,
+    TokenBucket,
+    describe_image,
+    describe_with_retries,
+)
+from clients import create_openai_client
+from dedup import DEFAULT_MAX_DISTANCE, DuplicateIndex
+from imaging import image_dhash
+from ingest import DEFAULT_UPSERT_BATCH_SIZE, SOURCE_IMPORT, build_note_payload, bulk_add_notes
+from profiles import COLLECTION_PROFILES, collection_embedding, create_collection, get_profile, qdrant_client_from_args
+
+# Te same ustawienia co w aplikacji
+EMBEDDING_MODEL = "text-embedding-3-large"
+QDRANT_COLLECTION_NAME = "notes"
+CACHE_DIR = ".ai_cache"
+DEFAULT_CHECKPOINT = "import_checkpoint.txt"
+
+MIME_TYPES = {".jpg": "image/jpeg", ".jpeg": "image/jpeg", ".png": "image/png"}
+
+
+def iter_images(directory):
+    # Generator - katalog z tysiącami zdjęć nie jest wczytywany do pamięci naraz
+    for root, dirs, files in os.walk(directory):
+        dirs.sort()
+        for name in sorted(files):
+            if os.path.splitext(name)[1].lower() in MIME_TYPES:
+                yield os.path.join(root, name)
+
+
+def mime_type_for(path):
+    return MIME_TYPES[os.path.splitext(path)[1].lower()]
+
+
+class Checkpoint:
+    # Plik z listą już zapisanych zdjęć (ścieżki względem importowanego katalogu), jedna na linię
+    def __init__(self, path):
+        self.path = path
+        self.done = set()
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                self.done = {line.rstrip("\n") for line in f if line.strip()}
+        self.file = open(path, "a", encoding="utf-8")
+
+    def __contains__(self, key):
+        return key in self.done
+
+    def mark(self, keys):
+        for key in keys:
+            self.done.add(key)
+            self.file.write(key + "\n")
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+    def close(self):
+        self.file.close()
+
+
+def import_directory(
+    directory,
+    client,
+    qdrant_client,
+    blob_store,
+    checkpoint,
+    collection_name=QDRANT_COLLECTION_NAME,
+    model=EMBEDDING_MODEL,
+    dimensions=None,
+    caption_cache=None,
+    embedding_cache=None,
+    max_workers=DEFAULT_MAX_WORKERS,
+    requests_per_minute=DEFAULT_REQUESTS_PER_MINUTE,
+    batch_size=DEFAULT_UPSERT_BATCH_SIZE,
+    max_in_flight=None,
+    duplicate_index=None,
+    tags=(),
+    log=print,
+):
+    # Opisy generują wątki w tle, a w tym czasie główny wątek liczy embeddingi
+    # i zapisuje gotowe partie. Liczba zdjęć "w locie" jest ograniczona,
+    # więc zużycie pamięci nie zależy od wielkości katalogu.
+    # Z duplicate_index zdjęcia prawie identyczne z zapisanymi (albo z wcześniejszymi
+    # w tym imporcie) są pomijane jeszcze przed opisem, więc nie kosztują zapytań do API.
+    max_in_flight = max_in_flight or max_workers * 2
+    bucket = TokenBucket(requests_per_minute)
+    stats = {"found": 0, "skipped": 0, "duplicates": 0, "captioned": 0, "saved": 0, "failed": 0}
+    ready = []
+    # Duplikaty zdjęć z tego samego importu trafiają do checkpointu dopiero po zapisie oryginału.
+    # Gdy oryginał się nie zapisze, jego hash wraca do puli, a duplikaty sprawdzimy w następnym uruchomieniu.
+    submitted = set()
+    saved_keys = set()
+    failed_keys = set()
+    absorbed = {}  # klucz oryginału -> klucze jego duplikatów
+
+    def caption_file(key, path):
+        # Zwraca (opis, None) albo (None, oryginał), gdy zdjęcie jest duplikatem
+        with open(path, "rb") as f:
+            bytes_data = f.read()
+        if duplicate_index is not None:
+            match = duplicate_index.claim(key, image_dhash(bytes_data))
+            if match is not None:
+                log(f"Duplikat: {key} ~ {match[0]} (różnica {match[1]} bitów)")
+                return None, match[0]
+        description = describe_with_retries(
+            lambda data, _: describe_image(client, data, cache=caption_cache),
+            bucket,
+            bytes_data,
+            mime_type_for(path),
+            DEFAULT_MAX_RETRIES,
+        )
+        return description, None
+
+    def mark_saved(keys):
+        keys = list(keys)
+        saved_keys.update(keys)
+        checkpoint.mark(keys + [duplicate for key in keys for duplicate in absorbed.pop(key, [])])
+
+    def release(key):
+        if duplicate_index is not None:
+            duplicate_index.remove(key)
+        failed_keys.add(key)
+        dropped = absorbed.pop(key, [])
+        if dropped:
+            log(f"Duplikaty {key} ({len(dropped)}) sprawdzimy ponownie przy następnym uruchomieniu.")
+
+    def mark_duplicate(key, original):
+        if original not in submitted or original in saved_keys:
+            checkpoint.mark([key])
+        elif original not in failed_keys:
+            absorbed.setdefault(original, []).append(key)
+
+    def save_batch():
+        notes = []
+        for key, path, description in ready:
+            try:
+                with open(path, "rb") as f:
+                    notes.append((key, build_note_payload(description, f.read(), mime_type_for(path), blob_store, tags=tags, source=SOURCE_IMPORT)))
+            except Exception as e:
+                stats["failed"] += 1
+                log(f"Błąd: {key}: {e}")
+                release(key)
+        ready.clear()
+        saved, failed = bulk_add_notes(
+            qdrant_client,
+            collection_name,
+            client,
+            notes,
+            model,
+            upsert_batch_size=batch_size,
+            cache=embedding_cache,
+            dimensions=dimensions,
+        )
+        mark_saved(saved)
+        stats["saved"] += len(saved)
+        stats["failed"] += len(failed)
+        for key, error in failed.items():
+            log(f"Błąd: {key}: {error}")
+            release(key)
+
+    def collect(in_flight):
+        done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+        for future in done:
+            key, path = in_flight.pop(future)
+            try:
+                description, original = future.result()
+            except Exception as e:
+                stats["failed"] += 1
+                log(f"Błąd opisu: {key}: {e}")
+                release(key)
+                continue
+            if description is None:
+                stats["duplicates"] += 1
+                mark_duplicate(key, original)
+                continue
+            stats["captioned"] += 1
+            ready.append((key, path, description))
+            if len(ready) >= batch_size:
+                save_batch()
+
+    started_at = time.monotonic()
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        in_flight = {}
+        for path in iter_images(directory):
+            stats["found"] += 1
+            key = os.path.relpath(path, directory)
+            if key in checkpoint:
+                stats["skipped"] += 1
+                continue
+            while len(in_flight) >= max_in_flight:
+                collect(in_flight)
+            submitted.add(key)
+            in_flight[executor.submit(caption_file, key, path)] = (key, path)
+        while in_flight:
+            collect(in_flight)
+    if ready:
+        save_batch()
+
+    stats["elapsed_seconds"] = time.monotonic() - started_at
+    processed = stats["saved"] + stats["failed"]
+    stats["images_per_second"] = processed / stats["elapsed_seconds"] if stats["elapsed_seconds"] else 0.0
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import katalogu zdjęć bez przeglądarki: opis -> embedding -> zapis w Qdrant.")
+    parser.add_argument("directory", help="Katalog ze zdjęciami (przeszukiwany rekurencyjnie)")
+    parser.add_argument("--checkpoint", default=DEFAULT_CHECKPOINT, help="Plik z postępem; ponowne uruchomienie pomija zapisane zdjęcia")
+    parser.add_argument("--path", help="Katalog lokalnej bazy Qdrant; bez tego używamy QDRANT_URL i QDRANT_API_KEY")
+    parser.add_argument("--collection", default=QDRANT_COLLECTION_NAME)
+    parser.add_argument("--blob-dir", default=BLOB_DIR, help="Katalog zdjęć przy lokalnej bazie (--path); przy serwerze zdjęcia trafiają do Qdranta")
+    parser.add_argument("--profile", default="full", choices=sorted(COLLECTION_PROFILES))
+    parser.add_argument("--workers", type=int, default=DEFAULT_MAX_WORKERS, help="Ile opisów generujemy jednocześnie")
+    parser.add_argument("--rpm", type=int, default=DEFAULT_REQUESTS_PER_MINUTE, help="Limit zapytań do GPT-4o na minutę")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_UPSERT_BATCH_SIZE, help="Ile zdjęć zapisujemy naraz")
+    parser.add_argument("--tag", action="append", default=[], help="Tag dopisywany do każdego zdjęcia (można podać kilka razy)")
+    parser.add_argument("--keep-duplicates", action="store_true", help="Nie pomijaj zdjęć prawie identycznych z już zapisanymi")
+    parser.add_argument("--duplicate-distance", type=int, default=DEFAULT_MAX_DISTANCE, help="Maksymalna różnica hashy percepcyjnych (w bitach, z 64) dla duplikatu")
+    args = parser.parse_args()
+
+    env = dotenv_values(".env")
+    api_key = os.getenv("OPENAI_API_KEY") or env.get("OPENAI_API_KEY")
+    if not api_key:
+        parser.error("Brak klucza OPENAI_API_KEY (zmienna środowiskowa albo plik .env).")
+
+    profile = get_profile(args.profile)
+    qdrant_client = qdrant_client_from_args(args)
+    if not qdrant_client.collection_exists(args.collection):
+        create_collection(qdrant_client, args.collection, profile, EMBEDDING_MODEL)
+    # Istniejąca kolekcja mogła dostać nowy model (reembed.py) - wektory muszą pasować do jej metadanych
+    model, dimensions = collection_embedding(qdrant_client, args.collection, EMBEDDING_MODEL)
+
+    caption_cache = PersistentCache(os.path.join(CACHE_DIR, "captions"))
+    embedding_cache = PersistentCache(os.path.join(CACHE_DIR, "embeddings"))
+    duplicate_index = None
+    if not args.keep_duplicates:
+        duplicate_index = DuplicateIndex.from_collection(qdrant_client, args.collection, max_distance=args.duplicate_distance)
+    checkpoint = Checkpoint(args.checkpoint)
+    try:
+        stats = import_directory(
+            args.directory,
+            create_openai_client(api_key, max_connections=max(args.workers * 2, 10)),
+            qdrant_client,
+            make_blob_store(qdrant_client, args.blob_dir),
+            checkpoint,
+            collection_name=args.collection,
+            model=model,
+            dimensions=dimensions,
+            caption_cache=caption_cache,
+            embedding_cache=embedding_cache,
+            max_workers=args.workers,
+            requests_per_minute=args.rpm,
+            batch_size=args.batch_size,
+            duplicate_index=duplicate_index,
+            tags=args.tag,
+        )
+    finally:
+        checkpoint.close()
+
+    print(
+        f"Znaleziono {stats['found']}, pominięto (już zapisane) {stats['skipped']}, duplikaty {stats['duplicates']}, "
+        f"opisano {stats['captioned']}, zapisano {stats['saved']}, błędy {stats['failed']}."
+    )
+    print(f"Czas: {stats['elapsed_seconds']:.1f} s, {stats['images_per_second']:.2f} zdjęć/s.")
+    cache_stats = caption_cache.stats()
+    print(f"Cache opisów: {cache_stats['memory_hits'] + cache_stats['disk_hits']} trafień, {cache_stats['misses']} chybień.")
+
+
+if __name__ == "__main__":
+    main()
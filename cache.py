@@ -0,0 +1,115 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+# Domyślne limity pamięci podręcznej
+DEFAULT_MAX_MEMORY_ITEMS = 512
+DEFAULT_MAX_DISK_BYTES = 256 * 1024 * 1024
+
+
+def caption_key(bytes_data):
+    # Opis zależy tylko od zawartości zdjęcia, a nie od nazwy pliku
+    return hashlib.sha256(bytes_data).hexdigest()
+
+
+def embedding_key(text, model, dimensions=None):
+    return hashlib.sha256(f"{model}\0{dimensions}\0{text}".encode("utf-8")).hexdigest()
+
+
+class PersistentCache:
+    # Dwupoziomowa pamięć podręczna: LRU w pamięci nad katalogiem z plikami JSON.
+    # Gdy katalog przekroczy max_disk_bytes, usuwamy najdawniej używane wpisy.
+    def __init__(self, directory, max_memory_items=DEFAULT_MAX_MEMORY_ITEMS, max_disk_bytes=DEFAULT_MAX_DISK_BYTES):
+        self.directory = directory
+        self.max_memory_items = max_memory_items
+        self.max_disk_bytes = max_disk_bytes
+        self.memory = OrderedDict()
+        self.lock = threading.Lock()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        os.makedirs(directory, exist_ok=True)
+        self.disk_bytes = sum(size for _, _, size in self._disk_entries())
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], f"{key}.json")
+
+    def _disk_entries(self):
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if name.endswith(".json"):
+                    path = os.path.join(root, name)
+                    try:
+                        stat = os.stat(path)
+                    except FileNotFoundError:
+                        continue
+                    yield path, stat.st_mtime, stat.st_size
+
+    def _remember(self, key, value):
+        self.memory[key] = value
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.max_memory_items:
+            self.memory.popitem(last=False)
+
+    def get(self, key):
+        with self.lock:
+            if key in self.memory:
+                self.memory.move_to_end(key)
+                self.memory_hits += 1
+                return self.memory[key]
+
+            path = self._path(key)
+            try:
+                with open(path, encoding="utf-8") as f:
+                    value = json.load(f)
+            except (FileNotFoundError, ValueError):
+                self.misses += 1
+                return None
+            # Odświeżamy czas modyfikacji, żeby eksmisja działała jak LRU
+            os.utime(path)
+            self.disk_hits += 1
+            self._remember(key, value)
+            return value
+
+    def put(self, key, value):
+        with self.lock:
+            self._remember(key, value)
+            path = self._path(key)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            try:
+                previous_size = os.path.getsize(path)
+            except FileNotFoundError:
+                previous_size = 0
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(value, f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+            self.disk_bytes += os.path.getsize(path) - previous_size
+            if self.disk_bytes > self.max_disk_bytes:
+                self._evict()
+
+    def _evict(self):
+        # Zostawiamy trochę zapasu, żeby nie sprzątać przy każdym zapisie
+        target = self.max_disk_bytes * 0.9
+        for path, _, size in sorted(self._disk_entries(), key=lambda entry: entry[1]):
+            if self.disk_bytes <= target:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                continue
+            self.disk_bytes -= size
+            key = os.path.basename(path)[:-len(".json")]
+            self.memory.pop(key, None)
+
+    def stats(self):
+        with self.lock:
+            return {
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "memory_items": len(self.memory),
+                "disk_bytes": self.disk_bytes,
+            }
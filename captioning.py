@@ -0,0 +1,178 @@
+import base64
+import hashlib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from cache import caption_key
+from imaging import RENDITION_MIME_TYPE, model_rendition
+from metrics import observe_size, record_usage, timed
+
+# Domyślne ustawienia równoległego generowania opisów
+DEFAULT_MAX_WORKERS = 4
+DEFAULT_REQUESTS_PER_MINUTE = 60
+DEFAULT_MAX_RETRIES = 3
+CAPTION_MODEL = "gpt-4o"
+CAPTION_PROMPT = "Stwórz opis obrazka w kilku słowach, co tam widzisz?"
+
+
+@timed("generate_image_description")
+def describe_image(client, bytes_data, cache=None):
+    # Opis zdjęcia z GPT-4o; rzuca wyjątek przy błędzie API
+    key = caption_key(bytes_data)
+    if cache is not None:
+        cached = cache.get(key)
+        if cached is not None:
+            return cached
+
+    # Do modelu wysyłamy pomniejszoną wersję - krótszy upload i szybsza odpowiedź
+    with timed("caption_encode"):
+        base64_image = base64.b64encode(model_rendition(bytes_data)).decode('utf-8')
+        file_type = RENDITION_MIME_TYPE.split('/')[-1]
+        image_url = f"data:image/{file_type};base64,{base64_image}"
+    observe_size("caption_request", len(image_url))
+
+    # Bez ponowień w bibliotece openai - ponawia describe_with_retries, które po 429
+    # wstrzymuje wszystkie wątki naraz; dwie warstwy mnożyłyby liczbę zapytań
+    with timed("caption_api"):
+        response = client.with_options(max_retries=0).chat.completions.create(
+            model=CAPTION_MODEL,
+            temperature=0,
+            messages=[
+                {
+                    "role": "user",
+                    "content": [
+                        {"type": "text", "text": CAPTION_PROMPT},
+                        {"type": "image_url", "image_url": {"url": image_url}}
+                    ]
+                }
+            ]
+        )
+    record_usage("caption", getattr(response, "usage", None))
+    description = response.choices[0].message.content
+    if cache is not None:
+        cache.put(key, description)
+    return description
+
+
+class TokenBucket:
+    # Ogranicznik zapytań: "wiadro" uzupełnia się w stałym tempie,
+    # każde zapytanie do API zabiera jeden żeton
+    def __init__(self, requests_per_minute, capacity=None):
+        self.rate = requests_per_minute / 60.0
+        self.capacity = capacity or max(1, min(requests_per_minute, DEFAULT_MAX_WORKERS))
+        self.tokens = float(self.capacity)
+        self.updated_at = time.monotonic()
+        self.paused_until = 0.0
+        self.lock = threading.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self._refill(now)
+                if now >= self.paused_until and self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = max(self.paused_until - now, (1 - self.tokens) / self.rate)
+            time.sleep(wait)
+
+    def pause(self, seconds):
+        # Po odpowiedzi 429 wstrzymujemy wszystkie wątki, a nie tylko ten, który ją dostał
+        with self.lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+            self.tokens = 0.0
+
+
+def _retry_after(error, attempt):
+    # Czas oczekiwania z nagłówka Retry-After, a jeśli go brak - wykładniczy backoff
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return min(2 ** attempt, 30)
+
+
+def _is_rate_limited(error):
+    return getattr(error, "status_code", None) == 429
+
+
+def _is_transient(error):
+    # Te same błędy, które ponawia biblioteka openai: 408, 409, 5xx i zerwane połączenie
+    import openai
+
+    status_code = getattr(error, "status_code", None)
+    return status_code in (408, 409) or (status_code or 0) >= 500 or isinstance(error, openai.APIConnectionError)
+
+
+def describe_with_retries(describe, bucket, bytes_data, mime_type, max_retries):
+    attempt = 0
+    while True:
+        bucket.acquire()
+        try:
+            return describe(bytes_data, mime_type)
+        except Exception as e:
+            if attempt >= max_retries:
+                raise
+            if _is_rate_limited(e):
+                bucket.pause(_retry_after(e, attempt))
+            elif _is_transient(e):
+                time.sleep(_retry_after(e, attempt))
+            else:
+                raise
+            attempt += 1
+
+
+def caption_images(
+    describe,
+    images,
+    max_workers=DEFAULT_MAX_WORKERS,
+    requests_per_minute=DEFAULT_REQUESTS_PER_MINUTE,
+    max_retries=DEFAULT_MAX_RETRIES,
+    on_progress=None,
+):
+    # images: lista krotek (nazwa, bajty, typ MIME)
+    # describe(bajty, typ MIME) zwraca opis albo rzuca wyjątek
+    # Zwraca (opisy, błędy) - słowniki nazwa -> opis / komunikat błędu.
+    # on_progress(nazwa, błąd, gotowe, wszystkie) jest wołane w wątku wywołującym,
+    # więc można w nim bezpiecznie używać elementów Streamlit.
+    descriptions = {}
+    errors = {}
+    if not images:
+        return descriptions, errors
+
+    bucket = TokenBucket(requests_per_minute)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        # Identyczne zdjęcia (np. wgrane dwa razy) opisujemy tylko raz
+        futures = {}
+        names_by_content = {}
+        for name, bytes_data, mime_type in images:
+            content_key = hashlib.sha256(bytes_data).hexdigest()
+            if content_key not in names_by_content:
+                names_by_content[content_key] = []
+                future = executor.submit(describe_with_retries, describe, bucket, bytes_data, mime_type, max_retries)
+                futures[future] = content_key
+            names_by_content[content_key].append(name)
+
+        done = 0
+        for future in as_completed(futures):
+            error = None
+            try:
+                description = future.result()
+            except Exception as e:
+                error = str(e)
+            for name in names_by_content[futures[future]]:
+                done += 1
+                if error:
+                    errors[name] = error
+                else:
+                    descriptions[name] = description
+                if on_progress:
+                    on_progress(name, error, done, len(images))
+
+    return descriptions, errors
@@ -0,0 +1,41 @@
+# Pula połączeń do API OpenAI: opisy idą równolegle z kilku wątków,
+# więc trzymamy otwarte połączenia (TLS zestawiany raz) dla wszystkich wątków.
+DEFAULT_MAX_CONNECTIONS = 20
+DEFAULT_MAX_KEEPALIVE_CONNECTIONS = 10
+DEFAULT_KEEPALIVE_EXPIRY = 60.0
+DEFAULT_TIMEOUT = 60.0  # GPT-4o z obrazem potrafi odpowiadać kilkanaście sekund
+DEFAULT_CONNECT_TIMEOUT = 5.0
+# Biblioteka openai sama ponawia 408/409/429/5xx i błędy połączenia:
+# wykładniczy backoff z losowym rozrzutem, z uwzględnieniem nagłówka Retry-After.
+# Opisy zdjęć je wyłączają (describe_image) - tam ponawia describe_with_retries ze wspólną pauzą po 429.
+DEFAULT_MAX_RETRIES = 4
+
+
+def create_openai_client(
+    api_key,
+    base_url=None,
+    timeout=DEFAULT_TIMEOUT,
+    connect_timeout=DEFAULT_CONNECT_TIMEOUT,
+    max_retries=DEFAULT_MAX_RETRIES,
+    max_connections=DEFAULT_MAX_CONNECTIONS,
+    max_keepalive_connections=DEFAULT_MAX_KEEPALIVE_CONNECTIONS,
+):
+    # Klient jest bezpieczny wątkowo - tworzymy go raz i używamy wszędzie.
+    # Import openai trwa około sekundy, więc robimy go dopiero tutaj.
+    import httpx
+    import openai
+
+    http_client = openai.DefaultHttpxClient(
+        limits=httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=DEFAULT_KEEPALIVE_EXPIRY,
+        ),
+    )
+    return openai.OpenAI(
+        api_key=api_key,
+        base_url=base_url,
+        timeout=httpx.Timeout(timeout, connect=connect_timeout),
+        max_retries=max_retries,
+        http_client=http_client,
+    )
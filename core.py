@@ -0,0 +1,431 @@
+import importlib
+import os
+import sys
+import threading
+import time
+
+from cache import PersistentCache
+from captioning import caption_images, describe_image
+from dedup import DuplicateIndex, find_duplicates, parse_hash
+from gallery import GalleryPager
+from ingest import build_note_payload, bulk_add_notes, bulk_delete_notes, embed_texts
+from jobs import JobQueue
+from lexical import BM25Index
+from metrics import REGISTRY, timed
+from profiles import collection_embedding, profile_for_size, search_params
+from search import (
+    KEYWORD_FILTER_CANDIDATES,
+    SEARCH_MODE_HYBRID,
+    SEARCH_MODE_KEYWORD,
+    SEARCH_MODE_SEMANTIC,
+    SearchCache,
+    TTLCache,
+    build_filter,
+    filter_ids,
+    filter_key,
+    hybrid_search,
+    recommend_ids,
+)
+
+# Wspólny rdzeń uruchamiania aplikacji: ciężkie biblioteki (qdrant_client, openai)
+# ładujemy dopiero przy pierwszym użyciu, kolekcję przygotowujemy raz na proces,
+# a czas przebiegów skryptu trafia do metryk (panel "Diagnostyka").
+# NotesApp to logika wspólna dla gotowe.py i v1.py; skrypty różnią się tylko klientem Qdrant,
+# magazynem zdjęć i wyglądem.
+
+# Ustawienia aplikacji
+EMBEDDING_MODEL_TTL = 30  # Jak długo pamiętamy model kolekcji (zapis i zapytania wektorowe sprawdzają go zawsze)
+COLLECTION_CHECK_TTL = 60  # Co ile sekund sprawdzamy, czy kolekcja nadal istnieje (np. po odtworzeniu bazy)
+KNOWN_TAGS_TTL = 60  # Co ile sekund odświeżamy listę tagów w filtrach (zapis odświeża ją od razu)
+CAPTION_MAX_WORKERS = 4  # Ile opisów generujemy jednocześnie
+CAPTION_REQUESTS_PER_MINUTE = 60  # Limit zapytań do GPT-4o na minutę
+EMBEDDING_BATCH_SIZE = 100  # Ile opisów w jednym zapytaniu o embeddingi
+UPSERT_BATCH_SIZE = 64  # Ile punktów w jednym zapisie do Qdrant
+UPSERT_WAIT = True  # Czy czekać, aż Qdrant potwierdzi zapis
+CACHE_DIR = ".ai_cache"  # Opisy i embeddingi zapisane na dysku
+CACHE_MAX_DISK_BYTES = 256 * 1024 * 1024
+GALLERY_PAGE_SIZE = 12  # Ile zdjęć ładujemy na jedną stronę galerii
+SEARCH_LIMIT = 10  # Ile wyników zwraca wyszukiwarka
+DENSE_SEARCH_TIMEOUT = 3.0  # Po tylu sekundach bez embeddingu zostają wyniki po słowach kluczowych
+DUPLICATE_MAX_DISTANCE = 6  # Ile bitów (z 64) hashy percepcyjnych może się różnić u prawie identycznych zdjęć
+
+
+def lazy_import(module_name):
+    # Import przy pierwszym użyciu; czas pierwszego importu zapisujemy w metrykach
+    if module_name in sys.modules:
+        return sys.modules[module_name]
+    started_at = time.perf_counter()
+    module = importlib.import_module(module_name)
+    REGISTRY.observe(
+        "app_import_seconds",
+        time.perf_counter() - started_at,
+        "Czas pierwszego importu ciężkich bibliotek",
+        module=module_name,
+    )
+    return module
+
+
+class SerializedQdrantClient:
+    # Lokalny Qdrant (path=...) nie ma żadnych blokad, a aplikacja woła go równocześnie z przebiegu
+    # skryptu, zadań zapisu w tle, doładowywania galerii i wyszukiwania wektorowego.
+    # Równoległy zapis i odczyt psuje wtedy wyniki ("operands could not be broadcast together"),
+    # więc każde wywołanie metody klienta wykonujemy pod jedną blokadą.
+    def __init__(self, qdrant_client):
+        self._client = qdrant_client
+        self._lock = threading.RLock()
+
+    def __getattr__(self, name):
+        attribute = getattr(self._client, name)
+        if not callable(attribute):
+            return attribute
+
+        def call(*args, **kwargs):
+            with self._lock:
+                return attribute(*args, **kwargs)
+
+        return call
+
+
+def make_qdrant_client(path=None, url=None, api_key=None):
+    # Lokalna baza w katalogu path albo serwer pod adresem url.
+    # Lokalną bazę używają wątki inne niż ten, który ją otworzył - stąd force_disable_check_same_thread
+    # i SerializedQdrantClient, który pilnuje, żeby wywołania nie szły równolegle.
+    qdrant_client = lazy_import("qdrant_client")
+    if path:
+        return SerializedQdrantClient(qdrant_client.QdrantClient(path=path, force_disable_check_same_thread=True))
+    return qdrant_client.QdrantClient(url=url, api_key=api_key)
+
+
+def bootstrap_collection(qdrant_client, collection_name, profile, embedding_model=None):
+    # Zakłada brakującą kolekcję, a istniejącej dopisuje brakujące indeksy payloadu
+    # i pola payloadu, których nie mają starsze notatki.
+    # Zwraca True, jeśli utworzył kolekcję.
+    # Aplikacja woła to raz na proces (st.cache_resource), a nie przy każdym przebiegu.
+    from ingest import backfill_payload
+    from profiles import create_collection, create_payload_indexes
+
+    with REGISTRY.timed("collection_bootstrap"):
+        if qdrant_client.collection_exists(collection_name):
+            create_payload_indexes(qdrant_client, collection_name)
+            backfill_payload(qdrant_client, collection_name)
+            return False
+        create_collection(qdrant_client, collection_name, profile, embedding_model)
+        return True
+
+
+class RunTimer:
+    # Mierzy przebieg skryptu Streamlit od początku do wybranych punktów ("first_paint", "total").
+    # Pierwszy przebieg w procesie ma etykietę "cold", kolejne "warm".
+    _lock = threading.Lock()
+    _seen_first_run = False
+
+    def __init__(self):
+        self.started_at = time.perf_counter()
+        with RunTimer._lock:
+            self.run = "warm" if RunTimer._seen_first_run else "cold"
+            RunTimer._seen_first_run = True
+
+    def mark(self, phase):
+        elapsed = time.perf_counter() - self.started_at
+        REGISTRY.observe("app_run_seconds", elapsed, "Czas przebiegu skryptu aplikacji", phase=phase, run=self.run)
+        return elapsed
+
+
+def note_from_point(point):
+    return {
+        "id": point.id,
+        "text": point.payload["text"],
+        "image_hash": point.payload.get("image_hash"),
+        "thumbnail_hash": point.payload.get("thumbnail_hash"),
+        "mime_type": point.payload.get("mime_type"),
+    }
+
+
+class NotesApp:
+    # Zapis, wyszukiwanie, galeria i usuwanie notatek jednej kolekcji, bez Streamlita.
+    # Skrypt trzyma jedną instancję na proces (st.cache_resource); metody są wołane
+    # zarówno z przebiegów skryptu, jak i z wątków zadań w tle.
+    def __init__(self, qdrant_client, blob_store, collection_name, embedding_model, profile, cache_dir=CACHE_DIR):
+        self.qdrant_client = qdrant_client
+        self.blob_store = blob_store
+        self.collection_name = collection_name
+        self.embedding_model = embedding_model  # Model dla nowej kolekcji; istniejąca ma swój w metadanych
+        self.profile = profile  # Profil dla nowej kolekcji; wyszukiwanie bierze profil z wymiaru istniejącej
+        # Pamięć podręczna opisów (klucz: hash zdjęcia) i embeddingów (klucz: hash tekstu i modelu)
+        self.caption_cache = PersistentCache(os.path.join(cache_dir, "captions"), max_disk_bytes=CACHE_MAX_DISK_BYTES)
+        self.embedding_cache = PersistentCache(os.path.join(cache_dir, "embeddings"), max_disk_bytes=CACHE_MAX_DISK_BYTES)
+        # Opisywanie i zapisywanie działa w tle - przebieg skryptu Streamlit go nie przerywa ani nie powtarza
+        self.jobs = JobQueue()
+        # Pobieramy tylko metadane; starsze punkty mają zdjęcie w polu "image", którego nie ściągamy
+        self.note_payload = lazy_import("qdrant_client.models").PayloadSelectorExclude(exclude=["image"])
+        self.gallery_pager = GalleryPager(qdrant_client, collection_name, page_size=GALLERY_PAGE_SIZE, with_payload=self.note_payload)
+        self.embeddings = TTLCache(1, EMBEDDING_MODEL_TTL)
+        self.known_tags = TTLCache(1, KNOWN_TAGS_TTL)
+        self.search_caches = {}
+        self.lock = threading.Lock()
+        self.index_lock = threading.Lock()
+        self._checked_at = None
+        self._lexical_index = None
+        self._duplicate_index = None
+
+    def ensure_collection(self):
+        # Kolekcję sprawdzamy co COLLECTION_CHECK_TTL sekund, a nie przy każdym przebiegu skryptu.
+        # Błąd nie jest zapamiętywany, więc następny przebieg spróbuje ponownie.
+        if self._checked_at is not None and time.monotonic() - self._checked_at < COLLECTION_CHECK_TTL:
+            return False
+        created = bootstrap_collection(self.qdrant_client, self.collection_name, self.profile, self.embedding_model)
+        self._checked_at = time.monotonic()
+        return created
+
+    def collection_embedding(self):
+        # Model i wymiar wektorów kolekcji, na którą wskazuje alias - po przepięciu aliasu
+        # zapytania same przechodzą na nowy model (najpóźniej po EMBEDDING_MODEL_TTL sekundach)
+        embedding = self.embeddings.get(self.collection_name)
+        if embedding is None:
+            embedding = collection_embedding(self.qdrant_client, self.collection_name, self.embedding_model)
+            self.embeddings.put(self.collection_name, embedding)
+        return embedding
+
+    def refresh_embedding(self):
+        # Model i wymiar prosto z kolekcji, z pominięciem EMBEDDING_MODEL_TTL (np. przed zapytaniem wektorowym)
+        self.embeddings.pop(self.collection_name)
+        return self.collection_embedding()
+
+    def search_cache(self, model=None):
+        # Powtórzone zapytania nie wołają OpenAI ani wyszukiwania wektorowego; osobny cache dla każdego modelu
+        if model is None:
+            model = self.collection_embedding()[0]
+        with self.lock:
+            if model not in self.search_caches:
+                self.search_caches[model] = SearchCache()
+            return self.search_caches[model]
+
+    def search_params(self, dimensions=None):
+        # Oversampling, rescoring i hnsw_ef z profilu, który kolekcja ma naprawdę - po migracji
+        # (profiles.py, reembed.py) może to być inny profil niż ten, z którym ją założyliśmy
+        if dimensions is None:
+            dimensions = self.collection_embedding()[1]
+        try:
+            return search_params(profile_for_size(dimensions))
+        except ValueError:
+            return None  # Wymiar spoza profili - domyślne ustawienia Qdranta
+
+    @property
+    def lexical_index(self):
+        # Lokalny indeks słów kluczowych, budowany raz z pól "text" i aktualizowany przy zapisie/usuwaniu
+        with self.index_lock:
+            if self._lexical_index is None:
+                self._lexical_index = BM25Index.from_collection(self.qdrant_client, self.collection_name)
+            return self._lexical_index
+
+    @property
+    def duplicate_index(self):
+        # Hashe percepcyjne zapisanych zdjęć - prawie identyczne zdjęcia wykrywamy przed wysłaniem do OpenAI
+        with self.index_lock:
+            if self._duplicate_index is None:
+                self._duplicate_index = DuplicateIndex.from_collection(
+                    self.qdrant_client, self.collection_name, max_distance=DUPLICATE_MAX_DISTANCE
+                )
+            return self._duplicate_index
+
+    def invalidate(self):
+        # Po każdej zmianie kolekcji
+        self.gallery_pager.invalidate()
+        with self.lock:
+            search_caches = list(self.search_caches.values())
+        for search_cache in search_caches:
+            search_cache.invalidate()
+
+    def describe_image(self, client, bytes_data, mime_type=None):
+        return describe_image(client, bytes_data, cache=self.caption_cache)
+
+    def find_duplicates(self, hashes):
+        # hashes: lista (nazwa, hash percepcyjny); słownik nazwa -> (oryginał, różnica, czy zapisany)
+        return find_duplicates(hashes, self.duplicate_index, DUPLICATE_MAX_DISTANCE)
+
+    @timed("add_note_to_db")
+    def save_notes(self, notes, client):
+        # notes: lista krotek (nazwa, note_text, bajty zdjęcia, typ MIME, tagi)
+        payloads = [
+            (name, build_note_payload(note_text, bytes_data, mime_type, self.blob_store, tags=tags))
+            for name, note_text, bytes_data, mime_type, tags in notes
+        ]
+
+        # Przy zapisie model sprawdzamy zawsze, żeby w trakcie przepinania aliasu nie zapisać wektorów starego modelu
+        model, dimensions = collection_embedding(self.qdrant_client, self.collection_name, self.embedding_model)
+        saved, failed = bulk_add_notes(
+            self.qdrant_client,
+            self.collection_name,
+            client,
+            payloads,
+            model,
+            embedding_chunk_size=EMBEDDING_BATCH_SIZE,
+            upsert_batch_size=UPSERT_BATCH_SIZE,
+            wait=UPSERT_WAIT,
+            cache=self.embedding_cache,
+            dimensions=dimensions,
+        )
+        texts = dict(payloads)
+        for key, note_id in saved.items():
+            self.lexical_index.add(note_id, texts[key]["text"])
+            self.duplicate_index.add(note_id, parse_hash(texts[key]["dhash"]))
+        self.invalidate()
+        self.known_tags.clear()
+        return saved, failed
+
+    @timed("delete_note_from_db")
+    def delete_notes(self, note_ids=None, points_filter=None):
+        # Wiele ID albo filtr payloadu w jednym zapytaniu; zwraca (usunięte ID, brakujące ID)
+        deleted, missing = bulk_delete_notes(
+            self.qdrant_client,
+            self.collection_name,
+            ids=note_ids,
+            points_filter=points_filter,
+            wait=UPSERT_WAIT,
+        )
+        for note_id in deleted:
+            self.lexical_index.remove(note_id)
+            self.duplicate_index.remove(note_id)
+        self.invalidate()
+        return deleted, missing
+
+    def submit_caption_job(self, images, client):
+        # images: lista krotek (nazwa, bajty, typ MIME); wynik zadania: słownik nazwa -> opis
+        def run(job):
+            descriptions, _ = caption_images(
+                lambda bytes_data, mime_type: self.describe_image(client, bytes_data, mime_type),
+                images,
+                max_workers=CAPTION_MAX_WORKERS,
+                requests_per_minute=CAPTION_REQUESTS_PER_MINUTE,
+                on_progress=lambda name, error, done, total: job.advance(name, error),
+            )
+            return descriptions
+
+        return self.jobs.submit("Generowanie opisów", len(images), run)
+
+    def submit_save_job(self, notes, client):
+        # notes: lista krotek (nazwa, note_text, bajty, typ MIME, tagi); zapisujemy partiami, żeby raportować postęp
+        def run(job):
+            for start in range(0, len(notes), UPSERT_BATCH_SIZE):
+                batch = notes[start:start + UPSERT_BATCH_SIZE]
+                _, failed = self.save_notes(batch, client)
+                for name, error in failed.items():
+                    job.advance(name, error, count=0)
+                job.advance(count=len(batch))
+
+        return self.jobs.submit("Zapisywanie zdjęć", len(notes), run)
+
+    @timed("load_image")
+    def load_note_image(self, note, thumbnail=True):
+        # Bajty zdjęcia czytamy dopiero, gdy kafelek jest faktycznie wyświetlany
+        if thumbnail and note.get("thumbnail_hash"):
+            return self.blob_store.get(note["thumbnail_hash"])
+        if note.get("image_hash"):
+            return self.blob_store.get(note["image_hash"])
+        points = self.qdrant_client.retrieve(collection_name=self.collection_name, ids=[note["id"]], with_payload=["image"])
+        return points[0].payload.get("image") if points else None
+
+    @timed("gallery_page")
+    def list_gallery_page(self, offset=None):
+        # Zwraca (notatki, offset następnej strony); None oznacza, że to ostatnia strona
+        points, next_offset = self.gallery_pager.page(offset)
+        return [note_from_point(point) for point in points], next_offset
+
+    def search_note_ids(self, client, query, limit=SEARCH_LIMIT, mode=SEARCH_MODE_HYBRID, filters=None):
+        # Zwraca (ID, czy_tylko_słowa_kluczowe).
+        # Filtry (build_filter w search.py) Qdrant sprawdza w trakcie wyszukiwania, po indeksach payloadu.
+        degraded = False
+        points_filter = build_filter(filters)
+        search_cache = self.search_cache()
+
+        def dense_search(normalized_query):
+            # Model sprawdzamy przy każdym zapytaniu wektorowym, a nie co EMBEDDING_MODEL_TTL:
+            # po przepięciu aliasu (reembed.py switch) wektor starego modelu trafiłby do kolekcji nowego.
+            # Powtórzone zapytania tu nie docierają - obsługuje je cache wyników.
+            model, dimensions = self.refresh_embedding()
+
+            def embed(text):
+                return embed_texts(client, [text], model, cache=self.embedding_cache, dimensions=dimensions)[0]
+
+            query_vector = self.search_cache(model).query_vector(normalized_query, embed)
+            with timed("qdrant_search"):
+                points = self.qdrant_client.query_points(
+                    collection_name=self.collection_name,
+                    query=query_vector,
+                    query_filter=points_filter,
+                    limit=limit,
+                    with_payload=False,
+                    search_params=self.search_params(dimensions),
+                ).points
+            return [point.id for point in points]
+
+        def keyword_search(normalized_query):
+            if points_filter is None:
+                return self.lexical_index.search(normalized_query, limit)
+            candidates = self.lexical_index.search(normalized_query, limit * KEYWORD_FILTER_CANDIDATES)
+            return filter_ids(self.qdrant_client, self.collection_name, candidates, points_filter)[:limit]
+
+        def run_search(normalized_query):
+            nonlocal degraded
+            if mode == SEARCH_MODE_SEMANTIC:
+                return dense_search(normalized_query)
+            keyword_ids = keyword_search(normalized_query)
+            if mode == SEARCH_MODE_KEYWORD:
+                return keyword_ids
+            ids, degraded = hybrid_search(keyword_ids, lambda: dense_search(normalized_query), limit, timeout=DENSE_SEARCH_TIMEOUT)
+            return ids
+
+        ids = search_cache.result_ids(query, run_search, limit, mode, filter_key(filters))
+        if degraded:
+            search_cache.forget(query, limit, mode, filter_key(filters))
+        return ids, degraded
+
+    def similar_note_ids(self, positive_ids, negative_ids=(), limit=SEARCH_LIMIT):
+        # Podobne zdjęcia po zapisanych wektorach - bez zapytania do OpenAI
+        def run_search(_):
+            with timed("qdrant_recommend"):
+                return recommend_ids(
+                    self.qdrant_client,
+                    self.collection_name,
+                    positive_ids,
+                    negative_ids,
+                    limit=limit,
+                    params=self.search_params(),
+                )
+
+        return self.search_cache().result_ids("", run_search, "similar", tuple(positive_ids), tuple(negative_ids), limit)
+
+    def notes_by_ids(self, ids):
+        points = self.qdrant_client.retrieve(collection_name=self.collection_name, ids=ids, with_payload=self.note_payload)
+        points_by_id = {str(point.id): point for point in points}
+        return [note_from_point(points_by_id[str(note_id)]) for note_id in ids if str(note_id) in points_by_id]
+
+    def list_filtered_notes(self, filters, limit=SEARCH_LIMIT):
+        # Same filtry, bez tekstu: najnowsze pasujące zdjęcia
+        models = lazy_import("qdrant_client.models")
+        points, _ = self.qdrant_client.scroll(
+            collection_name=self.collection_name,
+            scroll_filter=build_filter(filters),
+            limit=limit,
+            with_payload=self.note_payload,
+            order_by=models.OrderBy(key="uploaded_at", direction=models.Direction.DESC),
+        )
+        return [note_from_point(point) for point in points]
+
+    @timed("list_notes_from_db")
+    def list_notes(self, client, query=None, mode=SEARCH_MODE_HYBRID, filters=None):
+        # Zwraca (notatki, czy_tylko_słowa_kluczowe); bez zapytania - galeria albo same filtry
+        if not query:
+            if build_filter(filters) is not None:
+                return self.list_filtered_notes(filters), False
+            return self.list_gallery_page()[0], False
+        ids, degraded = self.search_note_ids(client, query, mode=mode, filters=filters)
+        return self.notes_by_ids(ids), degraded
+
+    def list_known_tags(self, limit=200):
+        # Tagi zapisanych zdjęć do listy wyboru w filtrach
+        tags = self.known_tags.get("tags")
+        if tags is None:
+            tags = [hit.value for hit in self.qdrant_client.facet(self.collection_name, key="tags", limit=limit).hits]
+            self.known_tags.put("tags", tags)
+        return tags
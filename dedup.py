@@ -0,0 +1,149 @@
+import threading
+
+# Ile z 64 bitów dHash może się różnić, żeby uznać zdjęcia za prawie identyczne.
+# 0-2: ta sama fotografia po ponownej kompresji lub zmianie rozmiaru,
+# do ~8: kolejne klatki zdjęć seryjnych; powyżej rośnie liczba fałszywych trafień.
+DEFAULT_MAX_DISTANCE = 6
+REBUILD_BATCH_SIZE = 256
+
+
+def hamming(a, b):
+    return bin(a ^ b).count("1")
+
+
+def parse_hash(value):
+    # W payloadzie hash jest zapisany szesnastkowo (64 bity nie mieszczą się w int64 Qdranta)
+    return int(value, 16)
+
+
+def format_hash(value):
+    return f"{value:016x}"
+
+
+class BKTree:
+    # Drzewo Burkharda-Kellera: krawędź do dziecka to odległość Hamminga od rodzica.
+    # Z nierówności trójkąta wystarczy odwiedzać dzieci z krawędzią w [d - r, d + r],
+    # więc zapytanie o małym promieniu sprawdza tylko niewielką część hashy.
+    def __init__(self):
+        self.root = None  # węzeł: [hash, lista elementów, {odległość: dziecko}]
+        self.size = 0
+
+    def add(self, value, item):
+        self.size += 1
+        if self.root is None:
+            self.root = [value, [item], {}]
+            return
+        node = self.root
+        while True:
+            distance = hamming(value, node[0])
+            if distance == 0:
+                node[1].append(item)
+                return
+            child = node[2].get(distance)
+            if child is None:
+                node[2][distance] = [value, [item], {}]
+                return
+            node = child
+
+    def search(self, value, max_distance):
+        # Zwraca listę (odległość, element) dla hashy w promieniu max_distance
+        found = []
+        stack = [self.root] if self.root is not None else []
+        while stack:
+            node = stack.pop()
+            distance = hamming(value, node[0])
+            if distance <= max_distance:
+                found.extend((distance, item) for item in node[1])
+            for edge, child in node[2].items():
+                if distance - max_distance <= edge <= distance + max_distance:
+                    stack.append(child)
+        return found
+
+
+class DuplicateIndex:
+    # Indeks hashy percepcyjnych zapisanych zdjęć (pole "dhash" w payloadzie).
+    # Z BK-drzewa nie da się tanio usuwać, więc usunięte punkty tylko pomijamy,
+    # a drzewo przebudowujemy, gdy takich punktów zrobi się dużo.
+    def __init__(self, max_distance=DEFAULT_MAX_DISTANCE):
+        self.max_distance = max_distance
+        self.tree = BKTree()
+        self.hashes = {}
+        self.lock = threading.RLock()
+
+    @classmethod
+    def from_collection(cls, qdrant_client, collection_name, max_distance=DEFAULT_MAX_DISTANCE, batch_size=REBUILD_BATCH_SIZE):
+        # Odbudowa z kolekcji - pobieramy tylko hash; starsze punkty bez hasha pomijamy
+        index = cls(max_distance)
+        if not qdrant_client.collection_exists(collection_name):
+            return index
+        offset = None
+        while True:
+            points, offset = qdrant_client.scroll(
+                collection_name=collection_name,
+                offset=offset,
+                limit=batch_size,
+                with_payload=["dhash"],
+                with_vectors=False,
+            )
+            for point in points:
+                if point.payload.get("dhash"):
+                    index.add(point.id, parse_hash(point.payload["dhash"]))
+            if offset is None:
+                return index
+
+    def add(self, item, value):
+        with self.lock:
+            self.hashes[item] = value
+            self.tree.add(value, (item, value))
+
+    def remove(self, item):
+        with self.lock:
+            self.hashes.pop(item, None)
+            if self.tree.size > 2 * len(self.hashes) + REBUILD_BATCH_SIZE:
+                self.tree = BKTree()
+                for key, value in self.hashes.items():
+                    self.tree.add(value, (key, value))
+
+    def find(self, value, max_distance=None):
+        # Najbliższe zapisane zdjęcie jako (element, odległość) albo None
+        max_distance = self.max_distance if max_distance is None else max_distance
+        with self.lock:
+            # W drzewie mogą zostać wpisy usuniętych albo zmienionych punktów
+            matches = [
+                (distance, item)
+                for distance, (item, stored) in self.tree.search(value, max_distance)
+                if self.hashes.get(item) == stored
+            ]
+        if not matches:
+            return None
+        distance, item = min(matches, key=lambda match: match[0])
+        return item, distance
+
+    def claim(self, item, value, max_distance=None):
+        # Sprawdzenie i dopisanie w jednym kroku, żeby dwa wątki nie przepuściły pary duplikatów.
+        # Zwraca (element, odległość) duplikatu albo None, gdy hash został dopisany.
+        with self.lock:
+            match = self.find(value, max_distance)
+            if match is None:
+                self.add(item, value)
+            return match
+
+    def __len__(self):
+        return len(self.hashes)
+
+
+def find_duplicates(images, index=None, max_distance=DEFAULT_MAX_DISTANCE):
+    # images: lista krotek (nazwa, hash). Sprawdzamy zapisane zdjęcia (index)
+    # i wcześniejsze zdjęcia z tej samej listy.
+    # Zwraca słownik nazwa -> (ID zapisanego zdjęcia albo nazwa pliku, odległość, czy już zapisane).
+    batch = DuplicateIndex(max_distance)
+    duplicates = {}
+    for name, value in images:
+        match = index.find(value, max_distance) if index is not None else None
+        if match is not None:
+            duplicates[name] = (*match, True)
+            continue
+        match = batch.claim(name, value)
+        if match is not None:
+            duplicates[name] = (*match, False)
+    return duplicates
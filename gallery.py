@@ -0,0 +1,59 @@
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+DEFAULT_PAGE_SIZE = 12
+DEFAULT_MAX_PREFETCHED = 4
+
+
+class GalleryPager:
+    # Stronicowanie galerii po offsetach z qdrant scroll. Po pobraniu strony
+    # następna ładuje się w tle, więc "Załaduj więcej" zwykle nie czeka na bazę.
+    # Koszt otwarcia galerii zależy od rozmiaru strony, a nie od liczby zdjęć.
+    def __init__(self, qdrant_client, collection_name, page_size=DEFAULT_PAGE_SIZE, with_payload=True, max_prefetched=DEFAULT_MAX_PREFETCHED):
+        self.qdrant_client = qdrant_client
+        self.collection_name = collection_name
+        self.page_size = page_size
+        self.with_payload = with_payload
+        self.max_prefetched = max_prefetched
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.prefetched = OrderedDict()
+        self.lock = threading.Lock()
+
+    def _fetch(self, offset):
+        return self.qdrant_client.scroll(
+            collection_name=self.collection_name,
+            offset=offset,
+            limit=self.page_size,
+            with_payload=self.with_payload,
+            with_vectors=False,
+        )
+
+    def prefetch(self, offset):
+        with self.lock:
+            if offset in self.prefetched:
+                return
+            self.prefetched[offset] = self.executor.submit(self._fetch, offset)
+            while len(self.prefetched) > self.max_prefetched:
+                self.prefetched.popitem(last=False)
+
+    def page(self, offset=None):
+        # Zwraca (punkty, offset następnej strony); None oznacza koniec galerii
+        with self.lock:
+            future = self.prefetched.pop(offset, None)
+        points = next_offset = None
+        if future is not None:
+            try:
+                points, next_offset = future.result()
+            except Exception:
+                future = None
+        if future is None:
+            points, next_offset = self._fetch(offset)
+        if next_offset is not None:
+            self.prefetch(next_offset)
+        return points, next_offset
+
+    def invalidate(self):
+        # Po dodaniu lub usunięciu zdjęć pobrane z wyprzedzeniem strony są nieaktualne
+        with self.lock:
+            self.prefetched.clear()
@@ -1,15 +1,38 @@
 import streamlit as st
-import openai
-from PIL import Image
-import base64
-from qdrant_client import QdrantClient
-from qdrant_client.models import PointStruct, Distance, VectorParams
-import uuid
-
-# Zmienne
+import os
+from blobstore import make_blob_store
+from cache import caption_key
+from core import NotesApp, RunTimer, make_qdrant_client
+from profiles import get_profile
+from search import SEARCH_MODE_HYBRID, SEARCH_MODE_KEYWORD, SEARCH_MODE_SEMANTIC
+from ui import (
+    delete_note_from_db,
+    find_upload_duplicates,
+    get_metrics_server,
+    get_openai_client,
+    list_notes_from_db,
+    show_duplicate_warning,
+    show_image,
+    show_ingest_jobs,
+    show_metrics_panel,
+    show_search_filters,
+    show_similar_notes,
+    skipped_as_duplicate,
+    without_notes,
+)
+
+# Czas przebiegu skryptu (panel "Diagnostyka"); ciężkie biblioteki ładują się dopiero po narysowaniu paska bocznego
+run_timer = RunTimer()
+
+# Zmienne (pozostałe ustawienia: core.py i ui.py)
+# Model dla nowej kolekcji; istniejąca ma swój model w metadanych (zmiana modelu: python reembed.py --help)
 EMBEDDING_MODEL = "text-embedding-3-large"
-EMBEDDING_DIM = 3072
 QDRANT_COLLECTION_NAME = "notes"
+# Profil nowej kolekcji z profiles.py: "full" (3072 wymiary), "balanced" lub "compact".
+# Istniejąca kolekcja jest wyszukiwana z ustawieniami profilu odpowiadającego jej wymiarowi.
+# Zmiana profilu istniejącej kolekcji: python profiles.py --profile ... (patrz --help)
+COLLECTION_PROFILE = get_profile("full")
+QDRANT_DATA_DIR = os.getenv("QDRANT_DATA_DIR", "qdrant_data")  # Katalog lokalnej bazy Qdrant
 
 # Tworzenie akordeonu w pasku bocznym
 with st.sidebar.expander("Wprowadź klucz API OpenAI", expanded=True):
@@ -18,142 +41,23 @@ with st.sidebar.expander("Wprowadź klucz API OpenAI", expanded=True):
     if api_key:
         st.success("Klucz jest OK")  
 
+run_timer.mark("first_paint")
+
 # Inicjalizacja klienta Qdrant
+# Dane zostają na dysku między restartami; ":memory:" przywraca bazę tylko w pamięci.
+# Zrzut i odtworzenie kolekcji: python snapshot.py --path qdrant_data dump/restore ...
+# Zdjęcia trzymamy poza kolekcją notatek (w katalogu blobs) - w payloadzie zostaje tylko hash, typ i wymiary
 @st.cache_resource
-def get_qdrant_client():
-    return QdrantClient(path=":memory:")
-
-qdrant_client = get_qdrant_client()
-
-def assure_db_collection_exists():
-    if not qdrant_client.collection_exists(QDRANT_COLLECTION_NAME):
-        qdrant_client.create_collection(
-            collection_name=QDRANT_COLLECTION_NAME,
-            vectors_config=VectorParams(
-                size=EMBEDDING_DIM,
-                distance=Distance.COSINE,
-            ),
-        )
-
-def generate_image_description(client, uploaded_file):
-    uploaded_file.seek(0)
-    try:
-        bytes_data = uploaded_file.getvalue()
-        base64_image = base64.b64encode(bytes_data).decode('utf-8')
-        file_type = uploaded_file.type.split('/')[-1]
-        image_url = f"data:image/{file_type};base64,{base64_image}"
-
-        response = client.chat.completions.create(
-            model="gpt-4o",
-            temperature=0,
-            messages=[
-                {
-                    "role": "user",
-                    "content": [
-                        {"type": "text", "text": "Stwórz opis obrazka w kilku słowach, co tam widzisz?"},
-                        {"type": "image_url", "image_url": {"url": image_url}}
-                    ]
-                }
-            ]
-        )
-        return response.choices[0].message.content
-
-    except Exception as e:
-        return f"Wystąpił błąd przy generowaniu opisu: {str(e)}"
-
-def generate_embeddings(client, description):
-    try:
-        result = client.embeddings.create(
-            input=[description],
-            model=EMBEDDING_MODEL,
-        )
-        embedding = result.data[0].embedding
-        return embedding
-    except Exception as e:
-        return f"Wystąpił błąd przy generowaniu embeddingu: {str(e)}"
-
-def add_note_to_db(note_text, uploaded_file, client):
-    vector = generate_embeddings(client, note_text)
-
-    uploaded_file.seek(0)
-    bytes_data = uploaded_file.getvalue()
-    base64_image = base64.b64encode(bytes_data).decode('utf-8')
-    file_type = uploaded_file.type.split('/')[-1]
-    image_url = f"data:image/{file_type};base64,{base64_image}"
-
-    # Użycie UUID jako unikalnego identyfikatora
-    note_id = str(uuid.uuid4())
-
-    qdrant_client.upsert(
-        collection_name=QDRANT_COLLECTION_NAME,
-        points=[
-            PointStruct(
-                id=note_id,
-                vector=vector,
-                payload={
-                    "text": note_text,
-                    "image": image_url
-                },
-            )
-        ]
-    )
-
-
-
-def list_notes_from_db(query=None):
-    if not query:
-        notes = qdrant_client.scroll(collection_name=QDRANT_COLLECTION_NAME, limit=10)[0]
-        return [
-            {
-                "id": note.id,  
-                "text": note.payload["text"],
-                "image": note.payload.get("image"),
-            } for note in notes
-        ]
-    else: 
-        query_vector = generate_embeddings(client, query)
-        notes = qdrant_client.search(
-            collection_name=QDRANT_COLLECTION_NAME,
-            query_vector=query_vector,
-            limit=10,
-        )
-        return [
-            {
-                "id": note.id,  
-                "text": note.payload["text"],
-                "image": note.payload.get("image"),
-            } for note in notes
-        ]
-    
-def delete_note_from_db(note_id):
-    try:
-        note_id_str = str(note_id)
-        print(f"Próbuję usunąć notatkę o ID: {note_id_str}")
-
-        # Sprawdzenie, czy notatka istnieje
-        existing_notes = list_notes_from_db()
-        existing_note_ids = [str(note["id"]) for note in existing_notes]
-
-        if note_id_str not in existing_note_ids:
-            st.warning(f"Notatka o ID {note_id_str} nie istnieje w bazie danych.")
-            return
-
-        # Użycie poprawnej metody usuwania
-        qdrant_client.delete(
-            collection_name=QDRANT_COLLECTION_NAME,
-            points_selector=[note_id_str]
-        )
-        st.success(f"Notatka o ID {note_id_str} została usunięta.")
-
-        print(f"Notatka o ID {note_id_str} została pomyślnie usunięta.") 
-    except Exception as e:
-        print(f"Wystąpił błąd podczas usuwania notatki o ID {note_id}: {e}")
-        st.error(f"Wystąpił błąd podczas usuwania notatki: {e}")
+def get_notes_app():
+    qdrant_client = make_qdrant_client(path=QDRANT_DATA_DIR)
+    return NotesApp(qdrant_client, make_blob_store(qdrant_client), QDRANT_COLLECTION_NAME, EMBEDDING_MODEL, COLLECTION_PROFILE)
+
+app = get_notes_app()
 
 # Główna część aplikacji
 if api_key:
-    client = openai.OpenAI(api_key=api_key)
-    assure_db_collection_exists()
+    client = get_openai_client(api_key)
+    app.ensure_collection()
 
     # Dodawanie nagłówka przed selectbox
     st.sidebar.markdown("# Wybierz opcję:")  
@@ -161,6 +65,9 @@ if api_key:
     # Tworzenie selectboxa
     selection = st.sidebar.selectbox("Wybierz opcję:", ["Dodaj zdjęcie", "Wyszukaj notatkę", "Galeria"])
 
+    get_metrics_server()
+    show_diagnostics = st.sidebar.checkbox("Pokaż diagnostykę")
+
     # Resetowanie stanu sesji po zmianie zakładki
     if 'uploaded_files' not in st.session_state:
         st.session_state['uploaded_files'] = []
@@ -170,37 +77,66 @@ if api_key:
         st.session_state['uploaded_files'] = []
         st.session_state['selected_option'] = selection
 
+    if 'ingest_jobs' not in st.session_state:
+        st.session_state['ingest_jobs'] = []
+        st.session_state['applied_jobs'] = set()
+
     if selection == "Dodaj zdjęcie":
         st.header("Dodaj Zdjęcia do galerii:")  
         st.markdown("<h5>Wczytaj zdjęcia (maks. 5)</h5>", unsafe_allow_html=True)  
         uploaded_files = st.file_uploader("", type=["jpg", "jpeg", "png"], accept_multiple_files=True)
+        show_ingest_jobs(app, "gallery_notes")
 
         if uploaded_files:
+            # Duplikaty wykrywamy lokalnie, zanim cokolwiek trafi do OpenAI
+            duplicates = find_upload_duplicates(app, uploaded_files)
+
             # Utworzymy kolumny dla przycisków
             col1, col2 = st.columns(2)
 
             # Przycisk generujący opisy dla wszystkich zdjęć
             with col1:
                 if st.button("Generuj opisy dla wszystkich zdjęć"):
-                    for uploaded_file in uploaded_files:
-                        description = generate_image_description(client, uploaded_file)
-                        if description and "Wystąpił błąd" not in description:
-                            st.session_state[f"note_text_{uploaded_file.name}"] = description
-                    st.success("Opisy zostały wygenerowane dla wszystkich zdjęć.")
+                    images = []
+                    for f in uploaded_files:
+                        if skipped_as_duplicate(f.name, duplicates):
+                            continue
+                        # Zdjęcia opisane już wcześniej bierzemy z cache, bez kolejki do API
+                        cached = app.caption_cache.get(caption_key(f.getvalue()))
+                        if cached is not None:
+                            st.session_state[f"note_text_{f.name}"] = cached
+                        else:
+                            images.append((f.name, f.getvalue(), f.type))
+                    if images:
+                        job = app.submit_caption_job(images, client)
+                        st.session_state.ingest_jobs.append((job.id, "caption"))
+                    else:
+                        st.success("Opisy zostały wygenerowane dla wszystkich zdjęć.")
 
             # Przycisk do zapisywania wszystkich zdjęć
             with col2:
                 if st.button("Zapisz wszystkie zdjęcia"):
-                    for uploaded_file in uploaded_files:
-                        if f"note_text_{uploaded_file.name}" in st.session_state and st.session_state[f"note_text_{uploaded_file.name}"]:
-                            add_note_to_db(note_text=st.session_state[f"note_text_{uploaded_file.name}"], uploaded_file=uploaded_file, client=client)  
-                    st.success("Wszystkie notatki zostały zapisane.", icon="👍")
+                    notes_to_save = [
+                        (
+                            uploaded_file.name,
+                            st.session_state[f"note_text_{uploaded_file.name}"],
+                            uploaded_file.getvalue(),
+                            uploaded_file.type,
+                            st.session_state.get(f"tags_{uploaded_file.name}", ""),
+                        )
+                        for uploaded_file in uploaded_files
+                        if st.session_state.get(f"note_text_{uploaded_file.name}") and not skipped_as_duplicate(uploaded_file.name, duplicates)
+                    ]
+                    if notes_to_save:
+                        job = app.submit_save_job(notes_to_save, client)
+                        st.session_state.ingest_jobs.append((job.id, "save"))
 
             # Wyświetlanie zdjęć i edytowanie notatek
             for uploaded_file in uploaded_files:
                 # Wyświetlanie obrazu
-                image = Image.open(uploaded_file)
-                st.image(image, caption='Wczytane zdjęcie', use_container_width=True)
+                st.image(uploaded_file, caption='Wczytane zdjęcie', use_container_width=True)
+                if uploaded_file.name in duplicates:
+                    show_duplicate_warning(uploaded_file.name, duplicates[uploaded_file.name])
 
                 # Wydziel odstęp między zdjęciami
                 st.markdown("---")  # Oddzielenie zdjęć
@@ -209,38 +145,86 @@ if api_key:
                 note_key = f"note_text_{uploaded_file.name}"
                 if note_key in st.session_state:
                     st.session_state[note_key] = st.text_area(f"Edytuj notatkę dla {uploaded_file.name}", value=st.session_state[note_key])
+                # Tagi trafiają do payloadu i służą do filtrowania w wyszukiwarce
+                st.text_input(f"Tagi dla {uploaded_file.name} (po przecinku)", key=f"tags_{uploaded_file.name}")
 
 
     # Obsługa zakładki "Wyszukaj notatkę"
     elif selection == "Wyszukaj notatkę":
         query = st.text_input("Wyszukaj notatkę")
+        search_modes = {
+            "Hybrydowe": SEARCH_MODE_HYBRID,
+            "Tylko słowa kluczowe (natychmiast)": SEARCH_MODE_KEYWORD,
+            "Tylko semantyczne": SEARCH_MODE_SEMANTIC,
+        }
+        search_mode = st.radio("Tryb wyszukiwania:", list(search_modes), horizontal=True)
+        filters = show_search_filters(app)
         if st.button("Szukaj"):
-            notes = list_notes_from_db(query)
+            notes = list_notes_from_db(app, client, query, mode=search_modes[search_mode], filters=filters)
             if notes:
                 cols = st.columns(3)
                 for i, note in enumerate(notes):
                     with cols[i % 3]:
-                        if note["image"]:
-                            st.image(note["image"], caption="Miniaturka zdjęcia", use_container_width=True)
+                        image = app.load_note_image(note)
+                        if image:
+                            show_image(image, caption="Miniaturka zdjęcia", use_container_width=True)
             else:
                 st.write("Brak pasujących notatek.")
 
     
        
     elif selection == "Galeria":
-        notes = list_notes_from_db()  # Pobierz notatki
+        # Pierwsza strona galerii; kolejne doładowujemy przyciskiem
+        if 'gallery_notes' not in st.session_state:
+            st.session_state.gallery_notes, st.session_state.gallery_next_offset = app.list_gallery_page()
+
+        # Usuwanie zaznaczonych zdjęć jednym zapytaniem
+        selected_ids = [note["id"] for note in st.session_state.gallery_notes if st.session_state.get(f"select_{note['id']}")]
+        if selected_ids and st.button(f"Usuń zaznaczone ({len(selected_ids)})"):
+            deleted, _ = app.delete_notes(selected_ids)
+            st.session_state.gallery_notes = without_notes(st.session_state.gallery_notes, deleted)
+            for note_id in selected_ids:
+                st.session_state.pop(f"select_{note_id}", None)
+            st.success(f"Usunięto zdjęcia: {len(deleted)}.")
+
+        # "Więcej takich" - wyniki po zapisanych wektorach, bez zapytania do OpenAI
+        if st.session_state.get("similar_to"):
+            show_similar_notes(app, st.session_state.similar_to)
+
+        notes = st.session_state.gallery_notes
         if notes:
             cols = st.columns(3)
             for i, note in enumerate(notes):
                 with cols[i % 3]:
-                    if note["image"]:
-                        st.image(note["image"], width=150)
+                    image = app.load_note_image(note)
+                    if image:
+                        show_image(image, width=150)
                         st.write(f"Notatka ID: {note['id']}")  # Wyświetl ID dla każdej notatki
                         # Przycisk do usuwania zdjęcia
                         if st.button(f"Usuń zdjęcie ID {note['id']}"):
                             print(f"Pr attempting to delete note with ID: {note['id']}")  # Potwierdzenie prób
-                            delete_note_from_db(note['id'])  # Usunięcie notatki
+                            if delete_note_from_db(app, note['id']):  # Usunięcie notatki
+                                st.session_state.gallery_notes = without_notes(st.session_state.gallery_notes, [note['id']])
+                        # Podobne zdjęcia do tego
+                        if st.button("Więcej takich", key=f"similar_{note['id']}"):
+                            st.session_state.similar_to = {"positive": [note['id']], "negative": []}
+                            st.rerun()
+                        # Zaznaczanie do usunięcia wielu zdjęć naraz
+                        st.checkbox("Zaznacz", key=f"select_{note['id']}")
+
+            # Kolejna strona jest już zwykle pobrana w tle
+            if st.session_state.gallery_next_offset is not None:
+                if st.button("Załaduj więcej"):
+                    more_notes, st.session_state.gallery_next_offset = app.list_gallery_page(st.session_state.gallery_next_offset)
+                    st.session_state.gallery_notes += more_notes
+                    st.rerun()
 
         else:
             st.write("Brak zapisanych zdjęć.")
-   
\ No newline at end of file
+   
+
+    run_timer.mark("total")
+
+    # Panel na końcu, żeby obejmował pomiary z bieżącego przebiegu
+    if show_diagnostics:
+        show_metrics_panel(app)
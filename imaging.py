@@ -0,0 +1,71 @@
+import io
+
+from PIL import Image, ImageOps
+
+# Dłuższy bok miniatury w galerii i wersji wysyłanej do modelu (w pikselach)
+THUMBNAIL_SIZE = 384
+MODEL_IMAGE_SIZE = 1024
+JPEG_QUALITY = 85
+RENDITION_MIME_TYPE = "image/jpeg"
+DHASH_SIZE = 8  # 8x8 porównań jasności = 64-bitowy hash
+
+
+def open_normalized(bytes_data):
+    return normalize(Image.open(io.BytesIO(bytes_data)))
+
+
+def normalize(image):
+    # Obracamy zgodnie z EXIF i sprowadzamy do RGB (przezroczystość na białym tle)
+    image = ImageOps.exif_transpose(image)
+    if image.mode in ("RGBA", "LA", "P"):
+        image = image.convert("RGBA")
+        background = Image.new("RGB", image.size, (255, 255, 255))
+        background.paste(image, mask=image.getchannel("A"))
+        return background
+    if image.mode != "RGB":
+        return image.convert("RGB")
+    return image
+
+
+def render(image, max_side, quality=JPEG_QUALITY):
+    # Pomniejszona kopia zapisana jako JPEG; mniejsze zdjęcia nie są powiększane
+    copy = image.copy()
+    copy.thumbnail((max_side, max_side), Image.LANCZOS)
+    output = io.BytesIO()
+    copy.save(output, "JPEG", quality=quality, optimize=True)
+    return output.getvalue()
+
+
+def model_rendition(bytes_data, max_side=MODEL_IMAGE_SIZE):
+    return render(open_normalized(bytes_data), max_side)
+
+
+def dhash(image, hash_size=DHASH_SIZE):
+    # Hash percepcyjny (difference hash): czy piksel jest jaśniejszy od sąsiada po prawej.
+    # Zmiana rozmiaru, kompresji czy lekka korekta kolorów zmienia tylko kilka bitów.
+    small = image.convert("L").resize((hash_size + 1, hash_size), Image.LANCZOS)
+    pixels = list(small.getdata())
+    value = 0
+    for row in range(hash_size):
+        for col in range(hash_size):
+            left = pixels[row * (hash_size + 1) + col]
+            right = pixels[row * (hash_size + 1) + col + 1]
+            value = value << 1 | (left > right)
+    return value
+
+
+def image_dhash(bytes_data):
+    # Hash liczony przed opisem, bez dekodowania zdjęcia w pełnej rozdzielczości
+    image = Image.open(io.BytesIO(bytes_data))
+    image.draft("RGB", (64, 64))  # JPEG dekodujemy od razu w zmniejszonej skali
+    return dhash(normalize(image))
+
+
+def preprocess_image(bytes_data, thumbnail_size=THUMBNAIL_SIZE):
+    # Etap przy zapisie: wymiary po obróceniu i miniatura do galerii
+    image = open_normalized(bytes_data)
+    return {
+        "width": image.width,
+        "height": image.height,
+        "thumbnail": render(image, thumbnail_size),
+    }
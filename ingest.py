@@ -0,0 +1,216 @@
+import time
+import uuid
+
+from cache import embedding_key
+from dedup import format_hash
+from imaging import image_dhash, preprocess_image
+from metrics import observe_size, record_usage, timed
+
+# Ile tekstów wysyłamy w jednym zapytaniu o embeddingi i ile punktów w jednym upsercie
+DEFAULT_EMBEDDING_CHUNK_SIZE = 100
+DEFAULT_UPSERT_BATCH_SIZE = 64
+
+
+# Skąd pochodzi zdjęcie (pole "source" w payloadzie)
+SOURCE_APP = "app"
+SOURCE_IMPORT = "import"
+# Wartości pól dla notatek zapisanych, zanim payload je miał - bez nich filtry i sortowanie
+# po dacie pomijałyby stare zdjęcia (uploaded_at=0: na końcu galerii, przed każdą datą)
+LEGACY_PAYLOAD_DEFAULTS = {"uploaded_at": 0, "source": SOURCE_APP}
+
+
+class EmbeddingError(Exception):
+    pass
+
+
+def normalize_tags(tags):
+    # Tagi z pola tekstowego ("las, Góry") albo z listy: małe litery, bez powtórzeń
+    if isinstance(tags, str):
+        tags = tags.split(",")
+    return sorted({tag.strip().lower() for tag in tags or () if tag.strip()})
+
+
+def build_note_payload(note_text, bytes_data, mime_type, blob_store, tags=(), source=SOURCE_APP):
+    # Zdjęcie i miniatura trafiają do magazynu blobów, w payloadzie zostają tylko metadane
+    # (pola z indeksem: patrz PAYLOAD_INDEXES w profiles.py)
+    observe_size("image_upload", len(bytes_data))
+    with timed("preprocess_image"):
+        rendition = preprocess_image(bytes_data)
+        dhash = image_dhash(bytes_data)
+    return {
+        "text": note_text,
+        "image_hash": blob_store.put(bytes_data),
+        "thumbnail_hash": blob_store.put(rendition["thumbnail"]),
+        "mime_type": mime_type,
+        "width": rendition["width"],
+        "height": rendition["height"],
+        "dhash": format_hash(dhash),  # Hash percepcyjny do wykrywania prawie identycznych zdjęć
+        "uploaded_at": int(time.time()),
+        "tags": normalize_tags(tags),
+        "source": source,
+    }
+
+
+def backfill_payload(qdrant_client, collection_name):
+    # Uzupełnia brakujące pola starszych notatek. Aplikacja woła to co kilkadziesiąt sekund,
+    # więc najpierw samo liczenie (po indeksie payloadu) - zapis tylko, gdy coś brakuje.
+    # Brak tagów nie wymaga uzupełnienia - filtr po tagach i tak pomija takie notatki.
+    # Zwraca liczbę uzupełnionych pól.
+    from qdrant_client.models import Filter, IsEmptyCondition, PayloadField
+
+    backfilled = 0
+    for field_name, value in LEGACY_PAYLOAD_DEFAULTS.items():
+        missing = Filter(must=[IsEmptyCondition(is_empty=PayloadField(key=field_name))])
+        count = qdrant_client.count(collection_name=collection_name, count_filter=missing, exact=True).count
+        if not count:
+            continue
+        qdrant_client.set_payload(collection_name=collection_name, payload={field_name: value}, points=missing, wait=True)
+        backfilled += count
+    return backfilled
+
+
+def _is_bad_request(error):
+    # openai.BadRequestError (400) dotyczy treści zapytania, więc może go powodować jeden z tekstów
+    return getattr(error, "status_code", None) == 400
+
+
+def _chunks(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+@timed("generate_embeddings")
+def embed_texts(client, texts, model, chunk_size=DEFAULT_EMBEDDING_CHUNK_SIZE, cache=None, dimensions=None):
+    # Jedno zapytanie do API na każdy kawałek listy zamiast jednego na tekst.
+    # Teksty znalezione w cache (albo powtórzone na liście) nie trafiają do API.
+    # dimensions skraca embeddingi modeli text-embedding-3 (None = pełny wymiar modelu).
+    texts = list(texts)
+    vectors = {}
+    missing = []
+    missing_set = set()
+    for text in texts:
+        if text in vectors or text in missing_set:
+            continue
+        cached = cache.get(embedding_key(text, model, dimensions)) if cache is not None else None
+        if cached is not None:
+            vectors[text] = cached
+        else:
+            missing.append(text)
+            missing_set.add(text)
+
+    for chunk in _chunks(missing, chunk_size):
+        try:
+            with timed("embedding_api"):
+                if dimensions is None:
+                    result = client.embeddings.create(input=chunk, model=model)
+                else:
+                    result = client.embeddings.create(input=chunk, model=model, dimensions=dimensions)
+        except Exception as e:
+            raise EmbeddingError(f"Wystąpił błąd przy generowaniu embeddingu: {e}") from e
+        record_usage("embedding", getattr(result, "usage", None))
+        for item in result.data:
+            text = chunk[item.index]
+            vectors[text] = item.embedding
+            if cache is not None:
+                cache.put(embedding_key(text, model, dimensions), item.embedding)
+
+    return [vectors[text] for text in texts]
+
+
+def bulk_add_notes(
+    qdrant_client,
+    collection_name,
+    client,
+    notes,
+    model,
+    embedding_chunk_size=DEFAULT_EMBEDDING_CHUNK_SIZE,
+    upsert_batch_size=DEFAULT_UPSERT_BATCH_SIZE,
+    wait=True,
+    cache=None,
+    dimensions=None,
+):
+    # notes: lista krotek (klucz, payload); payload musi zawierać "text".
+    # Zwraca (zapisane, błędy): słownik klucz -> ID punktu i słownik klucz -> komunikat.
+    # Błąd jednego kawałka nie przerywa zapisu pozostałych.
+    # qdrant_client importujemy tu, a nie na górze - import trwa ponad sekundę
+    from qdrant_client.models import PointStruct
+
+    saved = {}
+    failed = {}
+
+    points = []
+    for chunk in _chunks(list(notes), embedding_chunk_size):
+        try:
+            vectors = embed_texts(client, [payload["text"] for _, payload in chunk], model, embedding_chunk_size, cache, dimensions)
+            embedded = list(zip(chunk, vectors))
+        except EmbeddingError as e:
+            if not _is_bad_request(e.__cause__):
+                # 429, 5xx, błąd połączenia: biblioteka openai już ponawiała, a pojedyncze zapytania
+                # tylko pomnożyłyby ich liczbę - cały kawałek trafia do błędów
+                for key, _ in chunk:
+                    failed[key] = str(e)
+                continue
+            # Jeden zły tekst (400, np. za długi) nie powinien zablokować całego kawałka - ponawiamy pojedynczo
+            embedded = []
+            for key, payload in chunk:
+                try:
+                    embedded.append(((key, payload), embed_texts(client, [payload["text"]], model, cache=cache, dimensions=dimensions)[0]))
+                except EmbeddingError as e:
+                    failed[key] = str(e)
+        for (key, payload), vector in embedded:
+            points.append((key, PointStruct(id=str(uuid.uuid4()), vector=vector, payload=payload)))
+
+    for batch in _chunks(points, upsert_batch_size):
+        try:
+            with timed("qdrant_upsert"):
+                qdrant_client.upsert(
+                    collection_name=collection_name,
+                    points=[point for _, point in batch],
+                    wait=wait,
+                )
+        except Exception as e:
+            for key, _ in batch:
+                failed[key] = f"Wystąpił błąd przy zapisie do bazy: {e}"
+            continue
+        for key, point in batch:
+            saved[key] = point.id
+
+    return saved, failed
+
+
+def bulk_delete_notes(qdrant_client, collection_name, ids=None, points_filter=None, wait=True, scroll_batch_size=DEFAULT_UPSERT_BATCH_SIZE):
+    # Usuwa wiele punktów jednym zapytaniem: po liście ID albo po filtrze payloadu.
+    # Istnienie sprawdzamy po ID, bez payloadu i wektorów.
+    # Zwraca (usunięte ID, brakujące ID).
+    from qdrant_client.models import FilterSelector, PointIdsList
+
+    if points_filter is not None:
+        existing = []
+        offset = None
+        while True:
+            points, offset = qdrant_client.scroll(
+                collection_name=collection_name,
+                scroll_filter=points_filter,
+                offset=offset,
+                limit=scroll_batch_size,
+                with_payload=False,
+                with_vectors=False,
+            )
+            existing.extend(point.id for point in points)
+            if offset is None:
+                break
+        missing = []
+        selector = FilterSelector(filter=points_filter)
+    else:
+        # ID przekazujemy bez zmian - Qdrant nie przyjmuje liczbowego ID jako tekstu
+        ids = list(ids or [])
+        points = qdrant_client.retrieve(collection_name=collection_name, ids=ids, with_payload=False, with_vectors=False)
+        existing = [point.id for point in points]
+        existing_ids = {str(note_id) for note_id in existing}
+        missing = [note_id for note_id in ids if str(note_id) not in existing_ids]
+        selector = PointIdsList(points=existing)
+
+    if existing:
+        with timed("qdrant_delete"):
+            qdrant_client.delete(collection_name=collection_name, points_selector=selector, wait=wait)
+    return existing, missing
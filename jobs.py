@@ -0,0 +1,94 @@
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+
+# Partie przetwarzamy po kolei - równoległość jest już wewnątrz (pula opisów, zapis partiami)
+DEFAULT_MAX_WORKERS = 1
+DEFAULT_MAX_JOBS = 100
+
+
+class Job:
+    def __init__(self, name, total):
+        self.id = str(uuid.uuid4())
+        self.name = name
+        self.total = total
+        self.done = 0
+        self.errors = {}
+        self.status = JOB_QUEUED
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.finished_at = None
+        self.lock = threading.Lock()
+
+    def advance(self, item=None, error=None, count=1):
+        # Wołane przez zadanie po każdym przetworzonym elemencie
+        with self.lock:
+            self.done = min(self.total, self.done + count)
+            if error:
+                self.errors[item] = error
+
+    @property
+    def finished(self):
+        return self.status in (JOB_DONE, JOB_FAILED)
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                "id": self.id,
+                "name": self.name,
+                "status": self.status,
+                "done": self.done,
+                "total": self.total,
+                "errors": dict(self.errors),
+                "error": self.error,
+            }
+
+
+class JobQueue:
+    # Kolejka zadań w tle, współdzielona przez wszystkie sesje (st.cache_resource).
+    # Zadanie działa dalej, gdy Streamlit przerywa lub powtarza przebieg skryptu.
+    def __init__(self, max_workers=DEFAULT_MAX_WORKERS, max_jobs=DEFAULT_MAX_JOBS):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers)
+        self.max_jobs = max_jobs
+        self.jobs = OrderedDict()
+        self.lock = threading.Lock()
+
+    def _run(self, job, fn):
+        job.status = JOB_RUNNING
+        try:
+            job.result = fn(job)
+            job.status = JOB_DONE
+        except Exception as e:
+            job.error = str(e)
+            job.status = JOB_FAILED
+        finally:
+            job.finished_at = time.time()
+
+    def submit(self, name, total, fn):
+        # fn(job) wykonuje pracę, raportuje postęp przez job.advance() i zwraca wynik
+        job = Job(name, total)
+        with self.lock:
+            self.jobs[job.id] = job
+            self._prune()
+        self.executor.submit(self._run, job, fn)
+        return job
+
+    def _prune(self):
+        # Zapominamy najstarsze zakończone zadania
+        for job_id in list(self.jobs):
+            if len(self.jobs) <= self.max_jobs:
+                break
+            if self.jobs[job_id].finished:
+                del self.jobs[job_id]
+
+    def get(self, job_id):
+        with self.lock:
+            return self.jobs.get(job_id)
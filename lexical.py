@@ -0,0 +1,104 @@
+import bisect
+import heapq
+import math
+import re
+import threading
+from collections import Counter
+
+TOKEN_PATTERN = re.compile(r"\w+")
+# Polskie słowa się odmieniają, więc "kot" powinien trafić też w "koty" i "kotem"
+MIN_PREFIX_LENGTH = 3
+MAX_PREFIX_EXPANSIONS = 20
+REBUILD_BATCH_SIZE = 256
+
+
+def tokenize(text):
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+class BM25Index:
+    # Lokalny indeks słów kluczowych (BM25) nad polem "text" notatek.
+    # Wyszukiwanie nie wymaga żadnego zapytania sieciowego.
+    def __init__(self, k1=1.5, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.postings = {}
+        self.doc_terms = {}
+        self.doc_lengths = {}
+        self.total_length = 0
+        self.vocabulary = None
+        self.lock = threading.RLock()
+
+    @classmethod
+    def from_collection(cls, qdrant_client, collection_name, batch_size=REBUILD_BATCH_SIZE):
+        # Odbudowa z kolekcji - pobieramy tylko tekst, bez wektorów i zdjęć
+        index = cls()
+        if not qdrant_client.collection_exists(collection_name):
+            return index
+        offset = None
+        while True:
+            points, offset = qdrant_client.scroll(
+                collection_name=collection_name,
+                offset=offset,
+                limit=batch_size,
+                with_payload=["text"],
+                with_vectors=False,
+            )
+            for point in points:
+                index.add(point.id, point.payload.get("text", ""))
+            if offset is None:
+                return index
+
+    def add(self, doc_id, text):
+        with self.lock:
+            self.remove(doc_id)
+            counts = Counter(tokenize(text))
+            for term, tf in counts.items():
+                self.postings.setdefault(term, {})[doc_id] = tf
+            self.doc_terms[doc_id] = list(counts)
+            self.doc_lengths[doc_id] = sum(counts.values())
+            self.total_length += self.doc_lengths[doc_id]
+            self.vocabulary = None
+
+    def remove(self, doc_id):
+        with self.lock:
+            for term in self.doc_terms.pop(doc_id, []):
+                docs = self.postings[term]
+                docs.pop(doc_id, None)
+                if not docs:
+                    del self.postings[term]
+                    self.vocabulary = None
+            self.total_length -= self.doc_lengths.pop(doc_id, 0)
+
+    def _expand(self, term):
+        # Dokładne słowo plus słowa zaczynające się od niego
+        if len(term) < MIN_PREFIX_LENGTH:
+            return [term] if term in self.postings else []
+        if self.vocabulary is None:
+            self.vocabulary = sorted(self.postings)
+        start = bisect.bisect_left(self.vocabulary, term)
+        expansions = []
+        for candidate in self.vocabulary[start:start + MAX_PREFIX_EXPANSIONS]:
+            if not candidate.startswith(term):
+                break
+            expansions.append(candidate)
+        return expansions
+
+    def search(self, query, limit=10):
+        with self.lock:
+            if not self.doc_lengths:
+                return []
+            doc_count = len(self.doc_lengths)
+            average_length = self.total_length / doc_count
+            scores = {}
+            for query_term in set(tokenize(query)):
+                for term in self._expand(query_term):
+                    docs = self.postings[term]
+                    idf = math.log(1 + (doc_count - len(docs) + 0.5) / (len(docs) + 0.5))
+                    for doc_id, tf in docs.items():
+                        length_norm = 1 - self.b + self.b * self.doc_lengths[doc_id] / average_length
+                        scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (self.k1 + 1) / (tf + self.k1 * length_norm)
+            return [doc_id for doc_id, _ in heapq.nlargest(limit, scores.items(), key=lambda item: item[1])]
+
+    def __len__(self):
+        return len(self.doc_lengths)
@@ -0,0 +1,174 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Progi histogramów: czasy w sekundach i rozmiary w bajtach
+DURATION_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+SIZE_BUCKETS = tuple(1024 * 4 ** power for power in range(8))  # 1 KiB ... 16 MiB
+
+OPENMETRICS_CONTENT_TYPE = "application/openmetrics-text; version=1.0.0; charset=utf-8"
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{value}"' for key, value in labels) + "}"
+
+
+def _format_bound(bound):
+    return "+Inf" if bound == float("inf") else repr(float(bound))
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.bounds = tuple(buckets) + (float("inf"),)
+        self.counts = [0] * len(self.bounds)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q):
+        # Przybliżenie z progów histogramu (górna granica przedziału), jak histogram_quantile w Prometheusie
+        if not self.count:
+            return None
+        target = q * self.count
+        seen = 0
+        for bound, count in zip(self.bounds, self.counts):
+            seen += count
+            if seen >= target:
+                return bound if bound != float("inf") else self.bounds[-2]
+        return self.bounds[-2]
+
+
+class MetricsRegistry:
+    # Histogramy i liczniki z etykietami, eksport w formacie OpenMetrics
+    def __init__(self):
+        self.families = {}
+        self.lock = threading.Lock()
+
+    def _family(self, name, kind, help_text, buckets=None):
+        family = self.families.get(name)
+        if family is None:
+            family = {"kind": kind, "help": help_text, "buckets": buckets, "series": {}}
+            self.families[name] = family
+        return family
+
+    def observe(self, name, value, help_text="", buckets=DURATION_BUCKETS, **labels):
+        key = tuple(sorted(labels.items()))
+        with self.lock:
+            series = self._family(name, "histogram", help_text, buckets)["series"]
+            if key not in series:
+                series[key] = Histogram(buckets)
+            series[key].observe(value)
+
+    def inc(self, name, value=1, help_text="", **labels):
+        key = tuple(sorted(labels.items()))
+        with self.lock:
+            series = self._family(name, "counter", help_text)["series"]
+            series[key] = series.get(key, 0) + value
+
+    @contextmanager
+    def timed(self, stage):
+        # Działa jako "with timed(...)" i jako dekorator
+        started_at = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(
+                "photo_stage_duration_seconds",
+                time.perf_counter() - started_at,
+                "Czas etapów zapisu, wyszukiwania i wyświetlania zdjęć",
+                stage=stage,
+            )
+
+    def summary(self):
+        # Wiersze do panelu diagnostycznego: nazwa, etykiety, liczba, średnia, p50, p95 (lub wartość licznika)
+        rows = []
+        with self.lock:
+            for name, family in sorted(self.families.items()):
+                for key, series in sorted(family["series"].items()):
+                    labels = ", ".join(f"{label}={value}" for label, value in key)
+                    if family["kind"] == "counter":
+                        rows.append({"metryka": name, "etykiety": labels, "wartość": series})
+                    else:
+                        rows.append({
+                            "metryka": name,
+                            "etykiety": labels,
+                            "liczba": series.count,
+                            "średnia": series.sum / series.count if series.count else None,
+                            "p50": series.quantile(0.5),
+                            "p95": series.quantile(0.95),
+                        })
+        return rows
+
+    def to_openmetrics(self):
+        lines = []
+        with self.lock:
+            for name, family in sorted(self.families.items()):
+                exposed_name = name[:-len("_total")] if family["kind"] == "counter" and name.endswith("_total") else name
+                lines.append(f"# TYPE {exposed_name} {family['kind']}")
+                if family["help"]:
+                    lines.append(f"# HELP {exposed_name} {family['help']}")
+                for key, series in sorted(family["series"].items()):
+                    if family["kind"] == "counter":
+                        lines.append(f"{exposed_name}_total{_format_labels(key)} {series}")
+                        continue
+                    cumulative = 0
+                    for bound, count in zip(series.bounds, series.counts):
+                        cumulative += count
+                        lines.append(f"{name}_bucket{_format_labels(key + (('le', _format_bound(bound)),))} {cumulative}")
+                    lines.append(f"{name}_count{_format_labels(key)} {series.count}")
+                    lines.append(f"{name}_sum{_format_labels(key)} {series.sum}")
+        lines.append("# EOF")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+
+def timed(stage):
+    return REGISTRY.timed(stage)
+
+
+def observe_size(stage, size):
+    REGISTRY.observe("photo_payload_bytes", size, "Rozmiar danych wysyłanych w etapach", buckets=SIZE_BUCKETS, stage=stage)
+
+
+def record_usage(stage, usage):
+    # usage z odpowiedzi OpenAI (prompt_tokens, completion_tokens); brak usage jest pomijany
+    for kind in ("prompt_tokens", "completion_tokens"):
+        tokens = getattr(usage, kind, None)
+        if tokens:
+            REGISTRY.inc("openai_tokens_total", tokens, "Tokeny zużyte w zapytaniach do OpenAI", stage=stage, kind=kind)
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        if self.path != "/metrics":
+            self.send_error(404)
+            return
+        data = self.server.registry.to_openmetrics().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", OPENMETRICS_CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+def start_http_server(port, registry=REGISTRY, host="127.0.0.1"):
+    # Endpoint /metrics do zbierania przez Prometheusa. Bez uwierzytelniania, więc domyślnie
+    # tylko lokalnie; inny adres (np. "0.0.0.0" dla Prometheusa z innej maszyny) trzeba podać wprost.
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    server.daemon_threads = True
+    server.registry = registry
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
@@ -0,0 +1,278 @@
+import argparse
+import math
+import os
+
+# qdrant_client importujemy dopiero w funkcjach: sam import trwa ponad sekundę,
+# a aplikacja przy starcie potrzebuje z tego modułu tylko słownika profili.
+
+# Profile kolekcji: kompromis między pamięcią na zdjęcie, opóźnieniem wyszukiwania a trafnością.
+# "dimensions" to długość embeddingu text-embedding-3-large (parametr dimensions w API),
+# "oversampling" mówi, ilu kandydatów z kwantyzacji przeliczamy dokładnie (rescoring).
+COLLECTION_PROFILES = {
+    "full": {
+        "dimensions": 3072,
+        "quantization": None,
+        "oversampling": None,
+        "hnsw_m": None,
+        "hnsw_ef_construct": None,
+        "hnsw_ef": None,
+        "on_disk": False,
+    },
+    "balanced": {
+        "dimensions": 1536,
+        "quantization": "scalar",
+        "oversampling": 1.5,
+        "hnsw_m": 16,
+        "hnsw_ef_construct": 128,
+        "hnsw_ef": 64,
+        "on_disk": True,
+    },
+    "compact": {
+        "dimensions": 1024,
+        "quantization": "binary",
+        "oversampling": 3.0,
+        "hnsw_m": 12,
+        "hnsw_ef_construct": 100,
+        "hnsw_ef": 64,
+        "on_disk": True,
+    },
+}
+
+MIGRATION_BATCH_SIZE = 256
+# Domyślne HNSW Qdranta - profil bez własnych ustawień (None) wraca do nich przy migracji w miejscu
+DEFAULT_HNSW_M = 16
+DEFAULT_HNSW_EF_CONSTRUCT = 100
+# Model embeddingów zapisany w metadanych kolekcji - aplikacja pyta nim o wektory zapytań
+EMBEDDING_MODEL_KEY = "embedding_model"
+# Model, którym aplikacja liczyła wektory, zanim zaczęliśmy zapisywać go w metadanych kolekcji
+DEFAULT_SOURCE_MODEL = "text-embedding-3-large"
+
+# Pola payloadu z indeksem: filtry na nich Qdrant sprawdza w trakcie wyszukiwania wektorowego,
+# a nie po nim, więc zapytanie z filtrem zostaje szybkie przy rosnącej kolekcji
+PAYLOAD_INDEXES = {
+    "uploaded_at": "integer",
+    "tags": "keyword",
+    "source": "keyword",
+    "image_hash": "keyword",
+    "width": "integer",
+    "height": "integer",
+}
+
+
+def get_profile(name):
+    try:
+        return COLLECTION_PROFILES[name]
+    except KeyError:
+        raise ValueError(f"Nieznany profil kolekcji: {name}") from None
+
+
+def profile_for_size(size):
+    for profile in COLLECTION_PROFILES.values():
+        if profile["dimensions"] == size:
+            return profile
+    raise ValueError(f"Brak profilu kolekcji dla wektorów o wymiarze {size} - podaj --profile.")
+
+
+def _hnsw_config(profile):
+    from qdrant_client.models import HnswConfigDiff
+
+    if profile["hnsw_m"] is None and profile["hnsw_ef_construct"] is None:
+        return None
+    return HnswConfigDiff(m=profile["hnsw_m"], ef_construct=profile["hnsw_ef_construct"])
+
+
+def _quantization_config(profile):
+    # Skwantyzowane wektory trzymamy w RAM, a pełne (do rescoringu) mogą leżeć na dysku
+    from qdrant_client.models import (
+        BinaryQuantization,
+        BinaryQuantizationConfig,
+        ScalarQuantization,
+        ScalarQuantizationConfig,
+        ScalarType,
+    )
+
+    if profile["quantization"] == "scalar":
+        return ScalarQuantization(scalar=ScalarQuantizationConfig(type=ScalarType.INT8, quantile=0.99, always_ram=True))
+    if profile["quantization"] == "binary":
+        return BinaryQuantization(binary=BinaryQuantizationConfig(always_ram=True))
+    return None
+
+
+def vectors_config(profile):
+    from qdrant_client.models import Distance, VectorParams
+
+    return VectorParams(
+        size=profile["dimensions"],
+        distance=Distance.COSINE,
+        on_disk=profile["on_disk"] or None,
+    )
+
+
+def search_params(profile):
+    from qdrant_client.models import QuantizationSearchParams, SearchParams
+
+    if profile["quantization"] is None and profile["hnsw_ef"] is None:
+        return None
+    quantization = None
+    if profile["quantization"] is not None:
+        quantization = QuantizationSearchParams(rescore=True, oversampling=profile["oversampling"])
+    return SearchParams(hnsw_ef=profile["hnsw_ef"], quantization=quantization)
+
+
+def is_local_client(qdrant_client):
+    # Lokalna baza (path albo ":memory:") zamiast serwera
+    options = qdrant_client.init_options
+    return bool(options.get("path")) or options.get("location") == ":memory:"
+
+
+def create_payload_indexes(qdrant_client, collection_name):
+    # Dopisuje brakujące indeksy; istniejące zostają bez zmian.
+    # Lokalna baza indeksów payloadu nie ma (filtruje, przeglądając punkty) i nie zapisuje ich
+    # w schemacie, więc przy każdym starcie wołalibyśmy create_payload_index od nowa.
+    from qdrant_client.models import PayloadSchemaType
+
+    if is_local_client(qdrant_client):
+        return
+    existing = qdrant_client.get_collection(collection_name).payload_schema
+    for field_name, schema in PAYLOAD_INDEXES.items():
+        if field_name not in existing:
+            qdrant_client.create_payload_index(collection_name, field_name, PayloadSchemaType(schema), wait=True)
+
+
+def create_collection(qdrant_client, collection_name, profile, embedding_model=None):
+    qdrant_client.create_collection(
+        collection_name=collection_name,
+        vectors_config=vectors_config(profile),
+        hnsw_config=_hnsw_config(profile),
+        quantization_config=_quantization_config(profile),
+        metadata={EMBEDDING_MODEL_KEY: embedding_model} if embedding_model else None,
+    )
+    create_payload_indexes(qdrant_client, collection_name)
+
+
+def collection_embedding(qdrant_client, collection_name, default_model):
+    # (model, wymiar) wektorów kolekcji albo aliasu; starsze kolekcje nie mają modelu w metadanych
+    config = qdrant_client.get_collection(collection_name).config
+    return (config.metadata or {}).get(EMBEDDING_MODEL_KEY, default_model), config.params.vectors.size
+
+
+def shorten_embedding(vector, dimensions):
+    # Embeddingi text-embedding-3 można skrócić, obcinając je i normalizując ponownie -
+    # daje to ten sam wynik co parametr dimensions w API, bez płacenia za nowe wywołanie
+    shortened = vector[:dimensions]
+    norm = math.sqrt(sum(value * value for value in shortened)) or 1.0
+    return [value / norm for value in shortened]
+
+
+def migrate_collection(qdrant_client, source, target, profile, batch_size=MIGRATION_BATCH_SIZE, source_model=DEFAULT_SOURCE_MODEL):
+    # Przenosi kolekcję na nowy profil.
+    # Ten sam wymiar: zmiana indeksu i kwantyzacji w miejscu (source == target).
+    # Mniejszy wymiar: kopia do kolekcji target ze skróconymi wektorami; target dostaje w metadanych
+    # model źródła (source_model dla starszych kolekcji bez modelu), żeby aplikacja i reembed.py
+    # wiedziały, jak liczyć wektory zapytań. Aplikacja zacznie jej używać po przepięciu aliasu (--alias).
+    # Zwraca liczbę przeniesionych punktów.
+    from qdrant_client.models import Disabled, HnswConfigDiff, PointStruct, VectorParamsDiff
+
+    source_size = qdrant_client.get_collection(source).config.params.vectors.size
+    if profile["dimensions"] > source_size:
+        raise ValueError(
+            f"Nie można wydłużyć wektorów z {source_size} do {profile['dimensions']} wymiarów - "
+            "potrzebne jest ponowne wygenerowanie embeddingów."
+        )
+
+    if profile["dimensions"] == source_size and source == target:
+        # None w update_collection znaczy "bez zmian", więc brak kwantyzacji i domyślne HNSW
+        # profilu (np. "full") trzeba podać wprost, inaczej zostałyby ustawienia starego profilu
+        qdrant_client.update_collection(
+            collection_name=source,
+            vectors_config={"": VectorParamsDiff(on_disk=profile["on_disk"])},
+            hnsw_config=HnswConfigDiff(
+                m=profile["hnsw_m"] or DEFAULT_HNSW_M,
+                ef_construct=profile["hnsw_ef_construct"] or DEFAULT_HNSW_EF_CONSTRUCT,
+            ),
+            quantization_config=_quantization_config(profile) or Disabled.DISABLED,
+        )
+        return qdrant_client.count(source).count
+
+    if source == target:
+        raise ValueError("Zmiana wymiaru wymaga nowej kolekcji docelowej.")
+
+    if not qdrant_client.collection_exists(target):
+        create_collection(qdrant_client, target, profile, collection_embedding(qdrant_client, source, source_model)[0])
+
+    migrated = 0
+    offset = None
+    while True:
+        points, offset = qdrant_client.scroll(
+            collection_name=source,
+            offset=offset,
+            limit=batch_size,
+            with_payload=True,
+            with_vectors=True,
+        )
+        if points:
+            qdrant_client.upsert(
+                collection_name=target,
+                points=[
+                    PointStruct(
+                        id=point.id,
+                        vector=shorten_embedding(point.vector, profile["dimensions"]),
+                        payload=point.payload,
+                    )
+                    for point in points
+                ],
+                wait=True,
+            )
+            migrated += len(points)
+        if offset is None:
+            return migrated
+
+
+def qdrant_client_from_args(args):
+    from qdrant_client import QdrantClient
+
+    if args.path:
+        return QdrantClient(path=args.path)
+    return QdrantClient(url=os.getenv("QDRANT_URL"), api_key=os.getenv("QDRANT_API_KEY"))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Migracja kolekcji Qdrant na inny profil (wymiar, kwantyzacja, HNSW).")
+    parser.add_argument("--source", default="notes", help="Kolekcja źródłowa")
+    parser.add_argument("--target", help="Kolekcja docelowa (domyślnie ta sama co źródłowa)")
+    parser.add_argument("--profile", required=True, choices=sorted(COLLECTION_PROFILES))
+    parser.add_argument("--path", help="Katalog lokalnej bazy Qdrant; bez tego używamy QDRANT_URL i QDRANT_API_KEY")
+    parser.add_argument("--batch-size", type=int, default=MIGRATION_BATCH_SIZE)
+    parser.add_argument(
+        "--source-model",
+        default=DEFAULT_SOURCE_MODEL,
+        help="Model wektorów kolekcji źródłowej, jeśli nie ma go w metadanych (starsze kolekcje)",
+    )
+    parser.add_argument(
+        "--alias",
+        help="Po migracji do nowej kolekcji przepnij ten alias (np. notes), którego używa aplikacja, na --target. "
+        "Jeśli to jeszcze zwykła kolekcja, aplikacja musi być zatrzymana (patrz reembed.py).",
+    )
+    args = parser.parse_args()
+
+    qdrant_client = qdrant_client_from_args(args)
+    target = args.target or args.source
+    profile = get_profile(args.profile)
+    migrated = migrate_collection(qdrant_client, args.source, target, profile, batch_size=args.batch_size, source_model=args.source_model)
+    print(f"Przeniesiono {migrated} punktów do profilu {args.profile}.")
+    if args.alias and target != args.source:
+        # reembed.py importuje ten moduł, więc importujemy go dopiero tutaj
+        from reembed import switch_collection, sync_shortened
+
+        def sync(source, delete_extra):
+            return sync_shortened(qdrant_client, source, target, profile["dimensions"], delete_extra=delete_extra, batch_size=args.batch_size)
+
+        try:
+            previous, added, removed = switch_collection(qdrant_client, args.alias, target, sync, args.source_model)
+        except ValueError as e:
+            parser.error(str(e))
+        print(f"Dograno {added} i usunięto {removed} punktów. Alias {args.alias} wskazuje na {target}; powrót: reembed.py switch --target {previous}.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,365 @@
+import argparse
+import json
+import os
+
+from dotenv import dotenv_values
+
+from cache import PersistentCache
+from clients import create_openai_client
+from ingest import DEFAULT_EMBEDDING_CHUNK_SIZE, embed_texts
+from profiles import (
+    COLLECTION_PROFILES,
+    DEFAULT_SOURCE_MODEL,
+    collection_embedding,
+    create_collection,
+    get_profile,
+    profile_for_size,
+    qdrant_client_from_args,
+    shorten_embedding,
+)
+
+# Zmiana modelu embeddingów bez przerwy w działaniu aplikacji:
+#   1. copy   - nowa kolekcja (cień) z wektorami nowego modelu, liczonymi z zapisanych opisów;
+#               partiami, z plikiem stanu, więc przerwane kopiowanie można wznowić,
+#   2. switch - dogranie zmian z czasu kopiowania i atomowe przepięcie aliasu "notes" na cień.
+# Aplikacja czyta model z metadanych kolekcji, więc po przepięciu sama zaczyna go używać.
+# Stara kolekcja zostaje - powrót to "switch --target <stara kolekcja>".
+# Przy pierwszej migracji "notes" jest jeszcze zwykłą kolekcją: switch najpierw kopiuje ją
+# (wektory bez zmian) do notes_<model> i zamienia "notes" w alias na tę kopię.
+# Na czas tego pierwszego przełączenia aplikację trzeba zatrzymać - zapisy między ostatnim
+# dograniem a usunięciem oryginału przepadłyby. Kolejne przełączenia działają przy włączonej aplikacji.
+DEFAULT_ALIAS = "notes"
+# Pełny wymiar wektorów znanych modeli; text-embedding-3 można skracać parametrem dimensions
+EMBEDDING_MODEL_DIMENSIONS = {
+    "text-embedding-3-large": 3072,
+    "text-embedding-3-small": 1536,
+    "text-embedding-ada-002": 1536,
+}
+DEFAULT_STATE = "reembed_state.json"
+CACHE_DIR = ".ai_cache"
+REEMBED_BATCH_SIZE = 256
+ADOPT_ATTEMPTS = 3  # Ile razy próbujemy utworzyć alias, jeśli w międzyczasie ktoś założy kolekcję o tej nazwie
+
+
+class ReembedState:
+    # Postęp kopiowania: offset przewijania kolekcji źródłowej i liczba skopiowanych punktów
+    def __init__(self, path, source, target, model):
+        self.path = path
+        self.data = {"source": source, "target": target, "model": model, "offset": None, "copied": 0, "done": False}
+        if path and os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                saved = json.load(f)
+            if (saved["source"], saved["target"], saved["model"]) != (source, target, model):
+                raise ValueError(f"Plik stanu {path} dotyczy innej migracji ({saved['source']} -> {saved['target']}, {saved['model']}).")
+            self.data = saved
+
+    def save(self):
+        if not self.path:
+            return
+        temporary_path = self.path + ".tmp"
+        with open(temporary_path, "w", encoding="utf-8") as f:
+            json.dump(self.data, f)
+        os.replace(temporary_path, self.path)
+
+
+def _embed_points(client, points, model, dimensions, cache):
+    from qdrant_client.models import PointStruct
+
+    texts = [point.payload.get("text", "") for point in points]
+    vectors = embed_texts(client, texts, model, DEFAULT_EMBEDDING_CHUNK_SIZE, cache, dimensions)
+    return [PointStruct(id=point.id, vector=vector, payload=point.payload) for point, vector in zip(points, vectors)]
+
+
+def check_embedding_dimensions(client, model, dimensions):
+    # Sprawdzamy przed założeniem kolekcji: znane modele z tabeli, pozostałe jednym próbnym zapytaniem
+    native = EMBEDDING_MODEL_DIMENSIONS.get(model)
+    if native is not None and dimensions > native:
+        raise ValueError(f"Model {model} daje wektory o wymiarze {native}, a profil wymaga {dimensions} - wybierz mniejszy profil.")
+    vector = embed_texts(client, ["test"], model, dimensions=dimensions)[0]
+    if len(vector) != dimensions:
+        raise ValueError(f"Model {model} zwrócił wektor o wymiarze {len(vector)} zamiast {dimensions}.")
+
+
+def copy_collection(qdrant_client, client, source, target, model, profile, state_path=DEFAULT_STATE, batch_size=REEMBED_BATCH_SIZE, cache=None, log=print):
+    # Liczy embeddingi nowym modelem z pól "text" i zapisuje je w kolekcji target pod tymi samymi ID.
+    # Zapis jest idempotentny, więc wznowienie od ostatniego offsetu niczego nie dubluje.
+    # Zwraca liczbę skopiowanych punktów.
+    state = ReembedState(state_path, source, target, model)
+    if state.data["done"]:
+        return state.data["copied"]
+    if not qdrant_client.collection_exists(target):
+        check_embedding_dimensions(client, model, profile["dimensions"])
+        create_collection(qdrant_client, target, profile, embedding_model=model)
+
+    while True:
+        points, offset = qdrant_client.scroll(
+            collection_name=source,
+            offset=state.data["offset"],
+            limit=batch_size,
+            with_payload=True,
+            with_vectors=False,
+        )
+        if points:
+            qdrant_client.upsert(
+                collection_name=target,
+                points=_embed_points(client, points, model, profile["dimensions"], cache),
+                wait=True,
+            )
+        state.data["copied"] += len(points)
+        state.data["offset"] = offset
+        state.data["done"] = offset is None
+        state.save()
+        log(f"Skopiowano {state.data['copied']} punktów.")
+        if offset is None:
+            return state.data["copied"]
+
+
+def _all_ids(qdrant_client, collection_name, batch_size=REEMBED_BATCH_SIZE):
+    ids = {}
+    offset = None
+    while True:
+        points, offset = qdrant_client.scroll(
+            collection_name=collection_name,
+            offset=offset,
+            limit=batch_size,
+            with_payload=False,
+            with_vectors=False,
+        )
+        ids.update((str(point.id), point.id) for point in points)
+        if offset is None:
+            return ids
+
+
+def _sync_points(qdrant_client, source, target, convert, with_vectors, delete_extra, batch_size):
+    # Wspólna część synchronizacji: convert(rekordy ze źródła) -> punkty do zapisu w target
+    from qdrant_client.models import PointIdsList
+
+    source_ids = _all_ids(qdrant_client, source, batch_size)
+    target_ids = _all_ids(qdrant_client, target, batch_size)
+    missing = [source_ids[key] for key in source_ids.keys() - target_ids.keys()]
+    for start in range(0, len(missing), batch_size):
+        points = qdrant_client.retrieve(source, ids=missing[start:start + batch_size], with_payload=True, with_vectors=with_vectors)
+        qdrant_client.upsert(collection_name=target, points=convert(points), wait=True)
+    extra = [target_ids[key] for key in target_ids.keys() - source_ids.keys()] if delete_extra else []
+    if extra:
+        qdrant_client.delete(collection_name=target, points_selector=PointIdsList(points=extra), wait=True)
+    return len(missing), len(extra)
+
+
+def sync_collections(qdrant_client, client, source, target, model, dimensions, cache=None, delete_extra=True, batch_size=REEMBED_BATCH_SIZE):
+    # Dogrywa do target punkty dodane w źródle w trakcie kopiowania i (opcjonalnie)
+    # usuwa z target punkty usunięte w źródle. Zwraca (dodane, usunięte).
+    def convert(points):
+        return _embed_points(client, points, model, dimensions, cache)
+
+    return _sync_points(qdrant_client, source, target, convert, False, delete_extra, batch_size)
+
+
+def sync_shortened(qdrant_client, source, target, dimensions, delete_extra=True, batch_size=REEMBED_BATCH_SIZE):
+    # Jak sync_collections, ale dla kolekcji po migracji profilu (profiles.py): wektory tego samego
+    # modelu skracamy zamiast liczyć od nowa, więc nie potrzeba OpenAI
+    from qdrant_client.models import PointStruct
+
+    def convert(points):
+        return [PointStruct(id=point.id, vector=shorten_embedding(point.vector, dimensions), payload=point.payload) for point in points]
+
+    return _sync_points(qdrant_client, source, target, convert, True, delete_extra, batch_size)
+
+
+def _copy_points(qdrant_client, source, target, ids=None, batch_size=REEMBED_BATCH_SIZE):
+    # Kopiuje punkty z wektorami bez zmian: całą kolekcję albo tylko podane ID. Zwraca liczbę punktów.
+    copied = 0
+    if ids is not None:
+        for start in range(0, len(ids), batch_size):
+            points = qdrant_client.retrieve(source, ids=ids[start:start + batch_size], with_payload=True, with_vectors=True)
+            if points:
+                qdrant_client.upsert(collection_name=target, points=[_as_point(point) for point in points], wait=True)
+            copied += len(points)
+        return copied
+    offset = None
+    while True:
+        points, offset = qdrant_client.scroll(
+            collection_name=source,
+            offset=offset,
+            limit=batch_size,
+            with_payload=True,
+            with_vectors=True,
+        )
+        if points:
+            qdrant_client.upsert(collection_name=target, points=[_as_point(point) for point in points], wait=True)
+        copied += len(points)
+        if offset is None:
+            return copied
+
+
+def _as_point(record):
+    from qdrant_client.models import PointStruct
+
+    return PointStruct(id=record.id, vector=record.vector, payload=record.payload)
+
+
+def backup_name(alias, model):
+    # np. notes_text_embedding_3_large
+    return f"{alias}_{''.join(char if char.isalnum() else '_' for char in model)}"
+
+
+def _is_collection(qdrant_client, name):
+    # Zwykła kolekcja o tej nazwie; collection_exists zwraca True także dla aliasu
+    return any(description.name == name for description in qdrant_client.get_collections().collections)
+
+
+def _copy_missing(qdrant_client, source, target, batch_size=REEMBED_BATCH_SIZE):
+    source_ids = _all_ids(qdrant_client, source, batch_size)
+    target_ids = _all_ids(qdrant_client, target, batch_size)
+    return _copy_points(qdrant_client, source, target, ids=[source_ids[key] for key in source_ids.keys() - target_ids.keys()], batch_size=batch_size)
+
+
+def adopt_collection(qdrant_client, alias, backup, model, batch_size=REEMBED_BATCH_SIZE, attempts=ADOPT_ATTEMPTS):
+    # Zamienia zwykłą kolekcję alias w alias na jej kopię backup (te same wektory, model w metadanych).
+    # Między ostatnim dograniem a usunięciem oryginału nikt nie może do niego pisać, więc przy
+    # pierwszym przełączeniu aplikacja musi być zatrzymana. Jeśli mimo to zdąży założyć pustą kolekcję
+    # alias (assure_db_collection_exists) przed utworzeniem aliasu, dogrywamy z niej punkty, usuwamy ją
+    # i próbujemy ponownie. Przerwane wywołanie można powtórzyć. Zwraca liczbę punktów w kopii.
+    from qdrant_client.models import CreateAlias, CreateAliasOperation
+
+    if _is_collection(qdrant_client, alias):
+        model, size = collection_embedding(qdrant_client, alias, model)
+        if not qdrant_client.collection_exists(backup):
+            create_collection(qdrant_client, backup, profile_for_size(size), embedding_model=model)
+        _copy_points(qdrant_client, alias, backup, batch_size=batch_size)
+    elif not qdrant_client.collection_exists(backup):
+        raise ValueError(f"Nie ma ani kolekcji {alias}, ani jej kopii {backup}.")
+
+    for _ in range(attempts):
+        if _is_collection(qdrant_client, alias):
+            _copy_missing(qdrant_client, alias, backup, batch_size)
+            qdrant_client.delete_collection(alias)
+        if alias_target(qdrant_client, alias) != backup:
+            try:
+                qdrant_client.update_collection_aliases(
+                    change_aliases_operations=[CreateAliasOperation(create_alias=CreateAlias(collection_name=backup, alias_name=alias))]
+                )
+            except Exception:
+                if not _is_collection(qdrant_client, alias):
+                    raise
+                continue
+        # Lokalna baza tworzy alias nawet obok kolekcji o tej samej nazwie - sprawdzamy, czy jej nie ma
+        if not _is_collection(qdrant_client, alias):
+            return qdrant_client.count(backup).count
+    raise RuntimeError(f"Kolekcja {alias} wciąż powstaje na nowo - zatrzymaj aplikację i uruchom switch ponownie.")
+
+
+def alias_target(qdrant_client, alias):
+    for description in qdrant_client.get_aliases().aliases:
+        if description.alias_name == alias:
+            return description.collection_name
+    return None
+
+
+def switch_alias(qdrant_client, alias, target):
+    # Przepina alias na target jedną operacją - zapytania trafiają albo do starej, albo do nowej kolekcji.
+    # Zwraca nazwę kolekcji, na którą alias wskazywał wcześniej.
+    from qdrant_client.models import CreateAlias, CreateAliasOperation, DeleteAlias, DeleteAliasOperation
+
+    previous = alias_target(qdrant_client, alias)
+    operations = [CreateAliasOperation(create_alias=CreateAlias(collection_name=target, alias_name=alias))]
+    if previous is not None:
+        operations.insert(0, DeleteAliasOperation(delete_alias=DeleteAlias(alias_name=alias)))
+    elif qdrant_client.collection_exists(alias):
+        raise ValueError(f"{alias} jest zwykłą kolekcją, a nie aliasem - najpierw adopt_collection.")
+    qdrant_client.update_collection_aliases(change_aliases_operations=operations)
+    return previous
+
+
+def switch_collection(qdrant_client, alias, target, sync, source_model=DEFAULT_SOURCE_MODEL, log=print):
+    # Przepina alias na target: dogrywa zmiany z czasu kopiowania, przepina i jeszcze raz dogrywa to,
+    # co zdążyło trafić do starej kolekcji. sync(źródło, delete_extra) zwraca (dodane, usunięte).
+    # Gdy alias jest jeszcze zwykłą kolekcją, najpierw adopt_collection (aplikacja musi być zatrzymana).
+    # Zwraca (poprzednia kolekcja, dodane, usunięte).
+    source = alias_target(qdrant_client, alias) or alias
+    if source == target:
+        raise ValueError(f"Alias {alias} już wskazuje na {target}.")
+    if source == alias:
+        # Pierwsza migracja: oryginał zostaje jako kopia, na którą można wrócić.
+        # Bez kolekcji alias to wznowienie przerwanego adopt_collection.
+        if _is_collection(qdrant_client, alias):
+            source_model = collection_embedding(qdrant_client, alias, source_model)[0]
+        source = backup_name(alias, source_model)
+        if source == target:
+            raise ValueError(f"Kolekcja docelowa nie może nazywać się {source} - to nazwa kopii oryginału.")
+        kept = adopt_collection(qdrant_client, alias, source, source_model)
+        log(f"Kolekcja {alias} skopiowana do {source} ({kept} punktów); {alias} jest teraz aliasem na {source}.")
+    added, removed = sync(source, True)
+    previous = switch_alias(qdrant_client, alias, target)
+    late, _ = sync(previous, False)
+    return previous, added + late, removed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ponowne liczenie embeddingów nowym modelem w kolekcji-cieniu i przepięcie aliasu.")
+    parser.add_argument("--path", help="Katalog lokalnej bazy Qdrant; bez tego używamy QDRANT_URL i QDRANT_API_KEY")
+    parser.add_argument("--alias", default=DEFAULT_ALIAS, help="Nazwa, pod którą aplikacja widzi kolekcję")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    copy_parser = commands.add_parser("copy", help="Utwórz kolekcję-cień z wektorami nowego modelu (można wznawiać)")
+    copy_parser.add_argument("--model", required=True, help="Nowy model embeddingów, np. text-embedding-3-small")
+    copy_parser.add_argument("--profile", required=True, choices=sorted(COLLECTION_PROFILES), help="Profil (wymiar) nowej kolekcji")
+    copy_parser.add_argument("--target", required=True, help="Nazwa kolekcji-cienia, np. notes_3small")
+    copy_parser.add_argument("--state", default=DEFAULT_STATE, help="Plik z postępem kopiowania")
+    copy_parser.add_argument("--batch-size", type=int, default=REEMBED_BATCH_SIZE)
+
+    switch_parser = commands.add_parser(
+        "switch",
+        help="Dogranie zmian i przepięcie aliasu na kolekcję-cień (pierwsze przełączenie: przy zatrzymanej aplikacji)",
+    )
+    switch_parser.add_argument("--target", required=True, help="Kolekcja, na którą ma wskazywać alias")
+    switch_parser.add_argument(
+        "--source-model",
+        default=DEFAULT_SOURCE_MODEL,
+        help="Model wektorów zwykłej kolekcji bez modelu w metadanych (tylko przy pierwszej migracji)",
+    )
+    args = parser.parse_args()
+
+    env = dotenv_values(".env")
+    api_key = os.getenv("OPENAI_API_KEY") or env.get("OPENAI_API_KEY")
+    if not api_key:
+        parser.error("Brak klucza OPENAI_API_KEY (zmienna środowiskowa albo plik .env).")
+    client = create_openai_client(api_key)
+    qdrant_client = qdrant_client_from_args(args)
+    cache = PersistentCache(os.path.join(CACHE_DIR, "embeddings"))
+    source = alias_target(qdrant_client, args.alias) or args.alias
+
+    if args.command == "copy":
+        copied = copy_collection(
+            qdrant_client,
+            client,
+            source,
+            args.target,
+            args.model,
+            get_profile(args.profile),
+            state_path=args.state,
+            batch_size=args.batch_size,
+            cache=cache,
+        )
+        print(f"Kolekcja {args.target} ma wektory modelu {args.model} dla {copied} punktów. Teraz: switch --target {args.target}")
+        return
+
+    model, dimensions = collection_embedding(qdrant_client, args.target, None)
+    if model is None:
+        parser.error(f"Kolekcja {args.target} nie ma zapisanego modelu embeddingów.")
+
+    def sync(source, delete_extra):
+        return sync_collections(qdrant_client, client, source, args.target, model, dimensions, cache, delete_extra=delete_extra)
+
+    try:
+        previous, added, removed = switch_collection(qdrant_client, args.alias, args.target, sync, args.source_model)
+    except ValueError as e:
+        parser.error(str(e))
+    print(
+        f"Dograno {added} i usunięto {removed} punktów. Alias {args.alias} wskazuje na {args.target}; "
+        f"powrót: switch --target {previous}."
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,203 @@
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+# Wektory zapytań zmieniają się tylko razem z modelem, wyniki - przy każdym zapisie do kolekcji
+DEFAULT_VECTOR_CACHE_SIZE = 1024
+DEFAULT_VECTOR_TTL = 24 * 60 * 60
+DEFAULT_RESULT_CACHE_SIZE = 256
+DEFAULT_RESULT_TTL = 60
+
+# Tryby wyszukiwania: słowa kluczowe + wektory, same słowa kluczowe (bez sieci) i same wektory
+SEARCH_MODE_HYBRID = "hybrid"
+SEARCH_MODE_KEYWORD = "keyword"
+SEARCH_MODE_SEMANTIC = "semantic"
+# Stała z artykułu o Reciprocal Rank Fusion; tłumi wpływ pojedynczej wysokiej pozycji
+RRF_K = 60
+DEFAULT_DENSE_TIMEOUT = 3.0
+# Przy filtrach słowa kluczowe zwracają więcej kandydatów, bo część z nich filtr odrzuci
+KEYWORD_FILTER_CANDIDATES = 10
+
+_dense_executor = ThreadPoolExecutor(max_workers=4)
+
+
+def normalize_query(query):
+    return " ".join(query.lower().split())
+
+
+def reciprocal_rank_fusion(rankings, k=RRF_K):
+    scores = {}
+    ids = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking):
+            key = str(doc_id)
+            ids[key] = doc_id
+            scores[key] = scores.get(key, 0.0) + 1.0 / (k + rank + 1)
+    return [ids[key] for key in sorted(scores, key=scores.get, reverse=True)]
+
+
+def hybrid_search(keyword_ids, dense_search, limit, timeout=DEFAULT_DENSE_TIMEOUT):
+    # Łączy wyniki słów kluczowych z wyszukiwaniem wektorowym.
+    # Jeśli dense_search() rzuci wyjątek albo nie zdąży w timeout sekund,
+    # zwracamy same wyniki słów kluczowych. Zwraca (ID, czy_tylko_słowa_kluczowe).
+    future = _dense_executor.submit(dense_search)
+    try:
+        dense_ids = future.result(timeout=timeout)
+    except Exception:
+        return keyword_ids[:limit], True
+    return reciprocal_rank_fusion([keyword_ids, dense_ids])[:limit], False
+
+
+def build_filter(filters):
+    # filters: słownik z kluczami "tags" (dowolny z tagów), "uploaded_after" / "uploaded_before"
+    # (znaczniki czasu w sekundach, włącznie) i "source". Puste wartości są pomijane.
+    # Zwraca Filter Qdranta albo None, gdy nie ma żadnego warunku.
+    from qdrant_client.models import FieldCondition, Filter, MatchAny, MatchValue, Range
+
+    filters = filters or {}
+    conditions = []
+    if filters.get("tags"):
+        conditions.append(FieldCondition(key="tags", match=MatchAny(any=list(filters["tags"]))))
+    if filters.get("uploaded_after") is not None or filters.get("uploaded_before") is not None:
+        conditions.append(FieldCondition(
+            key="uploaded_at",
+            range=Range(gte=filters.get("uploaded_after"), lte=filters.get("uploaded_before")),
+        ))
+    if filters.get("source"):
+        conditions.append(FieldCondition(key="source", match=MatchValue(value=filters["source"])))
+    return Filter(must=conditions) if conditions else None
+
+
+def filter_key(filters):
+    # Postać filtrów, której można użyć jako klucza w SearchCache
+    return tuple(sorted(
+        (name, tuple(value) if isinstance(value, (list, tuple, set)) else value)
+        for name, value in (filters or {}).items()
+        if value not in (None, "", [], (), set())
+    ))
+
+
+def filter_ids(qdrant_client, collection_name, ids, points_filter, batch_size=256):
+    # Zostawia z listy (np. wyników słów kluczowych) tylko ID spełniające filtr.
+    # Filtr sprawdza Qdrant (po indeksach payloadu); kolejność listy zostaje zachowana.
+    from qdrant_client.models import Filter, HasIdCondition
+
+    if not ids or points_filter is None:
+        return list(ids)
+    matching = set()
+    for start in range(0, len(ids), batch_size):
+        batch = ids[start:start + batch_size]
+        points, _ = qdrant_client.scroll(
+            collection_name=collection_name,
+            scroll_filter=Filter(must=[HasIdCondition(has_id=batch), points_filter]),
+            limit=len(batch),
+            with_payload=False,
+            with_vectors=False,
+        )
+        matching.update(str(point.id) for point in points)
+    return [doc_id for doc_id in ids if str(doc_id) in matching]
+
+
+def recommend_ids(qdrant_client, collection_name, positive, negative=(), limit=10, params=None):
+    # "Więcej takich": Qdrant porównuje z zapisanymi wektorami wskazanych punktów,
+    # więc nie potrzebujemy embeddingu z OpenAI. Negatywne przykłady odpychają wyniki,
+    # a same przykłady nie pojawiają się na liście.
+    from qdrant_client.models import RecommendInput, RecommendQuery
+
+    points = qdrant_client.query_points(
+        collection_name=collection_name,
+        query=RecommendQuery(recommend=RecommendInput(positive=list(positive), negative=list(negative))),
+        limit=limit,
+        with_payload=False,
+        search_params=params,
+    ).points
+    return [point.id for point in points]
+
+
+class TTLCache:
+    # LRU z czasem życia wpisów
+    def __init__(self, max_items, ttl_seconds):
+        self.max_items = max_items
+        self.ttl_seconds = ttl_seconds
+        self.items = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self.lock:
+            entry = self.items.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                self.items.pop(key, None)
+                self.misses += 1
+                return None
+            self.items.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key, value):
+        with self.lock:
+            self.items[key] = (time.monotonic() + self.ttl_seconds, value)
+            self.items.move_to_end(key)
+            while len(self.items) > self.max_items:
+                self.items.popitem(last=False)
+
+    def pop(self, key):
+        with self.lock:
+            self.items.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.items.clear()
+
+    def __len__(self):
+        return len(self.items)
+
+
+class SearchCache:
+    # Cache znormalizowanych zapytań: tekst -> wektor oraz (tekst, parametry) -> lista ID wyników.
+    # invalidate() trzeba wołać po każdej zmianie kolekcji.
+    def __init__(
+        self,
+        vector_cache_size=DEFAULT_VECTOR_CACHE_SIZE,
+        vector_ttl=DEFAULT_VECTOR_TTL,
+        result_cache_size=DEFAULT_RESULT_CACHE_SIZE,
+        result_ttl=DEFAULT_RESULT_TTL,
+    ):
+        self.vectors = TTLCache(vector_cache_size, vector_ttl)
+        self.results = TTLCache(result_cache_size, result_ttl)
+        self.generation = 0
+        self.lock = threading.Lock()
+
+    def query_vector(self, query, embed):
+        # embed(tekst) jest wołane tylko przy braku wektora w cache
+        key = normalize_query(query)
+        vector = self.vectors.get(key)
+        if vector is None:
+            vector = embed(key)
+            self.vectors.put(key, vector)
+        return vector
+
+    def result_ids(self, query, search, *params):
+        # search(znormalizowany tekst) zwraca listę ID; dodatkowe parametry (limit, filtry) wchodzą do klucza
+        key = (normalize_query(query), params)
+        ids = self.results.get(key)
+        if ids is not None:
+            return ids
+        generation = self.generation
+        ids = list(search(key[0]))
+        # Nie zapisujemy wyników, jeśli w trakcie wyszukiwania kolekcja się zmieniła
+        with self.lock:
+            if generation == self.generation:
+                self.results.put(key, ids)
+        return ids
+
+    def forget(self, query, *params):
+        # Np. dla wyników zdegradowanych do słów kluczowych, żeby następne zapytanie spróbowało ponownie
+        self.results.pop((normalize_query(query), params))
+
+    def invalidate(self):
+        with self.lock:
+            self.generation += 1
+            self.results.clear()
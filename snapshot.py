@@ -0,0 +1,275 @@
+import argparse
+import base64
+import gzip
+import json
+import os
+from array import array
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import numpy as np
+from qdrant_client.models import Batch, PointStruct
+
+from blobstore import BLOB_DIR, LocalBlobStore, copy_blobs, make_blob_store
+from profiles import COLLECTION_PROFILES, collection_embedding, create_collection, get_profile, profile_for_size, qdrant_client_from_args
+
+SNAPSHOT_FORMAT = "notes-snapshot/1"
+SNAPSHOT_BATCH_SIZE = 256
+ARCHIVE_FORMAT = "notes-archive/1"
+ARCHIVE_BATCH_SIZE = 1024
+ARCHIVE_MAX_WORKERS = 4
+# Pola payloadu z kluczami magazynu blobów (blobstore.py)
+BLOB_FIELDS = ("image_hash", "thumbnail_hash")
+
+# Format pliku: gzip z liniami JSON. Pierwsza linia to nagłówek (format, kolekcja, wymiar, model),
+# każda kolejna to jeden punkt z wektorem zapisanym jako base64 z float32 -
+# kilka razy mniej niż wektor zapisany jako lista liczb w JSON.
+#
+# Archiwum (export/import) to katalog na duże kolekcje:
+#   manifest.json    - format, kolekcja, wymiar, model, liczba punktów,
+#   vectors.npy      - wszystkie wektory jako jedna tablica float32 (N x wymiar), czytana przez mmap,
+#   points.jsonl.gz  - ID i payload w kolejności wierszy vectors.npy,
+#   blobs.txt        - klucze zdjęć i miniatur z payloadów,
+#   blobs/           - same zdjęcia i miniatury (LocalBlobStore), skopiowane z magazynu źródłowego.
+# Import nie dekoduje wektorów z tekstu i zapisuje partie równolegle.
+
+
+def _encode_vector(vector):
+    return base64.b64encode(array("f", vector).tobytes()).decode("ascii")
+
+
+def _decode_vector(encoded):
+    vector = array("f")
+    vector.frombytes(base64.b64decode(encoded))
+    return vector.tolist()
+
+
+def dump_collection(qdrant_client, collection_name, output_path, batch_size=SNAPSHOT_BATCH_SIZE):
+    # Zwraca liczbę zapisanych punktów
+    model, size = collection_embedding(qdrant_client, collection_name, None)
+    dumped = 0
+    with gzip.open(output_path, "wt", encoding="utf-8") as f:
+        header = {"format": SNAPSHOT_FORMAT, "collection": collection_name, "size": size, "embedding_model": model}
+        f.write(json.dumps(header) + "\n")
+        offset = None
+        while True:
+            points, offset = qdrant_client.scroll(
+                collection_name=collection_name,
+                offset=offset,
+                limit=batch_size,
+                with_payload=True,
+                with_vectors=True,
+            )
+            for point in points:
+                record = {"id": point.id, "payload": point.payload, "vector": _encode_vector(point.vector)}
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            dumped += len(points)
+            if offset is None:
+                return dumped
+
+
+def _prepare_collection(qdrant_client, header, collection_name=None, profile=None):
+    # Brakującą kolekcję zakłada z profilem pasującym do wymiaru; zwraca nazwę kolekcji
+    collection_name = collection_name or header["collection"]
+    profile = profile or profile_for_size(header["size"])
+    if profile["dimensions"] != header["size"]:
+        raise ValueError(f"Profil ma {profile['dimensions']} wymiarów, a plik {header['size']}.")
+    if not qdrant_client.collection_exists(collection_name):
+        create_collection(qdrant_client, collection_name, profile, header.get("embedding_model"))
+    return collection_name
+
+
+def restore_collection(qdrant_client, input_path, collection_name=None, profile=None, batch_size=SNAPSHOT_BATCH_SIZE):
+    # Odtwarza punkty z pliku; brakującą kolekcję zakłada z profilem pasującym do wymiaru.
+    # Zwraca (nazwa kolekcji, liczba punktów).
+    with gzip.open(input_path, "rt", encoding="utf-8") as f:
+        header = json.loads(f.readline())
+        if header.get("format") != SNAPSHOT_FORMAT:
+            raise ValueError(f"Nieobsługiwany format pliku: {header.get('format')}")
+        collection_name = _prepare_collection(qdrant_client, header, collection_name, profile)
+
+        restored = 0
+        batch = []
+        for line in f:
+            record = json.loads(line)
+            batch.append(PointStruct(id=record["id"], vector=_decode_vector(record["vector"]), payload=record["payload"]))
+            if len(batch) >= batch_size:
+                qdrant_client.upsert(collection_name=collection_name, points=batch, wait=False)
+                restored += len(batch)
+                batch = []
+        if batch:
+            qdrant_client.upsert(collection_name=collection_name, points=batch, wait=True)
+            restored += len(batch)
+    return collection_name, restored
+
+
+def export_collection(qdrant_client, collection_name, output_dir, batch_size=ARCHIVE_BATCH_SIZE):
+    # Zwraca liczbę zapisanych punktów. Rozmiar tablicy wektorów ustalamy z góry z count(),
+    # więc do kolekcji nie można w tym czasie dopisywać punktów.
+    model, size = collection_embedding(qdrant_client, collection_name, None)
+    capacity = qdrant_client.count(collection_name, exact=True).count
+    os.makedirs(output_dir, exist_ok=True)
+    vectors = np.lib.format.open_memmap(os.path.join(output_dir, "vectors.npy"), mode="w+", dtype=np.float32, shape=(capacity, size))
+    blobs = set()
+    exported = 0
+    with gzip.open(os.path.join(output_dir, "points.jsonl.gz"), "wt", encoding="utf-8") as f:
+        offset = None
+        while True:
+            points, offset = qdrant_client.scroll(
+                collection_name=collection_name,
+                offset=offset,
+                limit=batch_size,
+                with_payload=True,
+                with_vectors=True,
+            )
+            if exported + len(points) > capacity:
+                raise ValueError(f"Kolekcja {collection_name} zmieniła się w trakcie eksportu - spróbuj ponownie.")
+            if points:
+                vectors[exported:exported + len(points)] = [point.vector for point in points]
+            for point in points:
+                f.write(json.dumps({"id": point.id, "payload": point.payload}, ensure_ascii=False) + "\n")
+                blobs.update(point.payload[field] for field in BLOB_FIELDS if point.payload.get(field))
+            exported += len(points)
+            if offset is None:
+                break
+    vectors.flush()
+    del vectors
+
+    with open(os.path.join(output_dir, "blobs.txt"), "w", encoding="utf-8") as f:
+        f.writelines(key + "\n" for key in sorted(blobs))
+    manifest = {
+        "format": ARCHIVE_FORMAT,
+        "collection": collection_name,
+        "size": size,
+        "embedding_model": model,
+        "count": exported,  # Przy usunięciach w trakcie eksportu końcowe wiersze vectors.npy są puste
+    }
+    with open(os.path.join(output_dir, "manifest.json"), "w", encoding="utf-8") as f:
+        json.dump(manifest, f)
+    return exported
+
+
+def archive_blob_keys(archive_dir):
+    with open(os.path.join(archive_dir, "blobs.txt"), encoding="utf-8") as f:
+        return [key for key in (line.strip() for line in f) if key]
+
+
+def export_blobs(output_dir, blob_store):
+    # Zdjęcia z blobs.txt z magazynu aplikacji do katalogu blobs/ archiwum; zwraca (skopiowane, brakujące)
+    return copy_blobs(archive_blob_keys(output_dir), blob_store, LocalBlobStore(os.path.join(output_dir, "blobs")))
+
+
+def import_blobs(input_dir, blob_store):
+    # Zdjęcia z katalogu blobs/ archiwum do magazynu docelowego; zwraca (skopiowane, brakujące)
+    return copy_blobs(archive_blob_keys(input_dir), LocalBlobStore(os.path.join(input_dir, "blobs")), blob_store)
+
+
+def missing_blobs(input_dir, blob_store):
+    # Klucze z blobs.txt, których nie ma w magazynie docelowym
+    return [key for key in archive_blob_keys(input_dir) if not blob_store.exists(key)]
+
+
+def import_collection(qdrant_client, input_dir, collection_name=None, profile=None, batch_size=ARCHIVE_BATCH_SIZE, max_workers=ARCHIVE_MAX_WORKERS):
+    # Wektory czytamy przez mmap, więc w pamięci jest tylko kilka partii naraz.
+    # Równoległe zapisy (max_workers > 1) tylko dla serwera Qdrant, nie dla lokalnej bazy.
+    # Zwraca (nazwa kolekcji, liczba punktów).
+    with open(os.path.join(input_dir, "manifest.json"), encoding="utf-8") as f:
+        header = json.load(f)
+    if header.get("format") != ARCHIVE_FORMAT:
+        raise ValueError(f"Nieobsługiwany format archiwum: {header.get('format')}")
+    collection_name = _prepare_collection(qdrant_client, header, collection_name, profile)
+    vectors = np.load(os.path.join(input_dir, "vectors.npy"), mmap_mode="r")
+
+    def upsert_batch(start, records):
+        qdrant_client.upsert(
+            collection_name=collection_name,
+            points=Batch(
+                ids=[record["id"] for record in records],
+                vectors=vectors[start:start + len(records)].tolist(),
+                payloads=[record["payload"] for record in records],
+            ),
+            wait=True,
+        )
+        return len(records)
+
+    imported = 0
+    in_flight = set()
+    with ThreadPoolExecutor(max_workers=max_workers) as executor, gzip.open(os.path.join(input_dir, "points.jsonl.gz"), "rt", encoding="utf-8") as f:
+        start = 0
+        records = []
+        for line in f:
+            records.append(json.loads(line))
+            if len(records) < batch_size:
+                continue
+            # Ograniczamy liczbę partii w kolejce, żeby nie wczytać całego pliku do pamięci
+            if len(in_flight) >= max_workers * 2:
+                done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                imported += sum(future.result() for future in done)
+            in_flight.add(executor.submit(upsert_batch, start, records))
+            start += len(records)
+            records = []
+        if records:
+            in_flight.add(executor.submit(upsert_batch, start, records))
+        imported += sum(future.result() for future in in_flight)
+    return collection_name, imported
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Zrzut i odtworzenie kolekcji Qdrant (wektory + payload) do jednego pliku. "
+        "Lokalnej bazy (--path) nie może w tym czasie używać uruchomiona aplikacja."
+    )
+    parser.add_argument("--path", help="Katalog lokalnej bazy Qdrant; bez tego używamy QDRANT_URL i QDRANT_API_KEY")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    dump_parser = commands.add_parser("dump", help="Zapisz kolekcję do pliku")
+    dump_parser.add_argument("output", help="Plik wynikowy, np. notes.snap.gz")
+    dump_parser.add_argument("--collection", default="notes")
+
+    restore_parser = commands.add_parser("restore", help="Wczytaj kolekcję z pliku")
+    restore_parser.add_argument("input", help="Plik utworzony poleceniem dump")
+    restore_parser.add_argument("--collection", help="Kolekcja docelowa (domyślnie ta z pliku)")
+    restore_parser.add_argument("--profile", choices=sorted(COLLECTION_PROFILES))
+
+    export_parser = commands.add_parser("export", help="Zapisz kolekcję do katalogu-archiwum (dla dużych kolekcji)")
+    export_parser.add_argument("output", help="Katalog wynikowy, np. notes_archive")
+    export_parser.add_argument("--collection", default="notes")
+    export_parser.add_argument("--batch-size", type=int, default=ARCHIVE_BATCH_SIZE)
+    export_parser.add_argument("--blob-dir", default=BLOB_DIR, help="Katalog zdjęć przy lokalnej bazie (--path); przy serwerze zdjęcia są w Qdrancie")
+
+    import_parser = commands.add_parser("import", help="Wczytaj kolekcję z katalogu-archiwum")
+    import_parser.add_argument("input", help="Katalog utworzony poleceniem export")
+    import_parser.add_argument("--collection", help="Kolekcja docelowa (domyślnie ta z archiwum)")
+    import_parser.add_argument("--profile", choices=sorted(COLLECTION_PROFILES))
+    import_parser.add_argument("--batch-size", type=int, default=ARCHIVE_BATCH_SIZE)
+    import_parser.add_argument("--workers", type=int, default=ARCHIVE_MAX_WORKERS, help="Ile partii zapisujemy jednocześnie")
+    import_parser.add_argument("--blob-dir", default=BLOB_DIR, help="Katalog zdjęć przy lokalnej bazie (--path); przy serwerze zdjęcia są w Qdrancie")
+
+    args = parser.parse_args()
+    qdrant_client = qdrant_client_from_args(args)
+    if args.command == "export":
+        exported = export_collection(qdrant_client, args.collection, args.output, args.batch_size)
+        copied, missing = export_blobs(args.output, make_blob_store(qdrant_client, args.blob_dir))
+        print(f"Zapisano {exported} punktów i {copied} zdjęć do {args.output}.")
+        if missing:
+            print(f"Uwaga: w magazynie zdjęć brakuje {len(missing)} plików z blobs.txt - archiwum ich nie zawiera.")
+    elif args.command == "import":
+        profile = get_profile(args.profile) if args.profile else None
+        # Lokalna baza (--path) zapisuje w jednym pliku SQLite i nie znosi równoległych zapisów
+        workers = 1 if args.path else args.workers
+        collection_name, imported = import_collection(qdrant_client, args.input, args.collection, profile, args.batch_size, workers)
+        print(f"Zaimportowano {imported} punktów do kolekcji {collection_name}.")
+        copied, missing = import_blobs(args.input, make_blob_store(qdrant_client, args.blob_dir))
+        print(f"Skopiowano {copied} zdjęć do magazynu zdjęć.")
+        if missing:
+            print(f"Uwaga: w archiwum brakuje {len(missing)} zdjęć z blobs.txt - te notatki nie będą miały obrazka.")
+    elif args.command == "dump":
+        dumped = dump_collection(qdrant_client, args.collection, args.output)
+        print(f"Zapisano {dumped} punktów do {args.output}.")
+    else:
+        profile = get_profile(args.profile) if args.profile else None
+        collection_name, restored = restore_collection(qdrant_client, args.input, args.collection, profile)
+        print(f"Odtworzono {restored} punktów w kolekcji {collection_name}.")
+
+
+if __name__ == "__main__":
+    main()
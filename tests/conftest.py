@@ -0,0 +1,30 @@
+import os
+import sys
+
+# Moduły aplikacji leżą w katalogu głównym repozytorium
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import hashlib
+import random
+from types import SimpleNamespace
+
+import pytest
+
+
+class StubEmbeddings:
+    # Zamiast OpenAI: deterministyczny wektor z hasha tekstu i modelu, w żądanym wymiarze
+    def __init__(self):
+        self.calls = []
+
+    def create(self, input, model, dimensions=None):
+        self.calls.append((list(input), model, dimensions))
+        data = []
+        for index, text in enumerate(input):
+            rng = random.Random(hashlib.sha256(f"{model}:{text}".encode()).digest())
+            data.append(SimpleNamespace(index=index, embedding=[rng.uniform(-1, 1) for _ in range(dimensions or 3072)]))
+        return SimpleNamespace(data=data, usage=None)
+
+
+@pytest.fixture
+def openai_client():
+    return SimpleNamespace(embeddings=StubEmbeddings())
@@ -0,0 +1,115 @@
+import hashlib
+import io
+import random
+import shutil
+from types import SimpleNamespace
+
+from PIL import Image
+from qdrant_client import QdrantClient
+
+from blobstore import LocalBlobStore
+from bulk_import import Checkpoint, import_directory
+from conftest import StubEmbeddings
+from core import bootstrap_collection
+from dedup import DuplicateIndex
+from profiles import get_profile
+
+PROFILE = get_profile("compact")
+
+
+class ApiError(Exception):
+    def __init__(self, status_code):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+
+
+class StubOpenAI:
+    # Opis to hash wysłanego obrazka; embeddingi z StubEmbeddings, z możliwością awarii API
+    def __init__(self):
+        self.captions = 0
+        self.failing = False
+        self.embeddings = StubEmbeddings()
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.caption))
+        create = self.embeddings.create
+
+        def embed(input, model, dimensions=None):
+            if self.failing:
+                raise ApiError(503)
+            return create(input, model, dimensions)
+
+        self.embeddings.create = embed
+
+    def with_options(self, **kwargs):
+        return self
+
+    def caption(self, model, temperature, messages):
+        self.captions += 1
+        url = messages[0]["content"][1]["image_url"]["url"]
+        message = SimpleNamespace(content=f"opis {hashlib.sha256(url.encode()).hexdigest()[:8]}")
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=None)
+
+
+def write_image(path, seed):
+    # Losowy szum - różne ziarna dają różne hashe percepcyjne
+    rng = random.Random(seed)
+    image = Image.new("L", (32, 32))
+    image.putdata([rng.randrange(256) for _ in range(32 * 32)])
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG")
+    path.write_bytes(buffer.getvalue())
+
+
+def run_import(directory, client, qdrant_client, blob_store, checkpoint_path, duplicate_index):
+    checkpoint = Checkpoint(str(checkpoint_path))
+    try:
+        return import_directory(
+            str(directory),
+            client,
+            qdrant_client,
+            blob_store,
+            checkpoint,
+            collection_name="notes",
+            dimensions=PROFILE["dimensions"],
+            max_workers=1,
+            requests_per_minute=6000,
+            duplicate_index=duplicate_index,
+            log=lambda message: None,
+        )
+    finally:
+        checkpoint.close()
+
+
+def test_import_resumes_from_checkpoint_and_keeps_duplicates_of_failed_originals(tmp_path):
+    directory = tmp_path / "photos"
+    directory.mkdir()
+    write_image(directory / "a.png", 1)
+    shutil.copy(directory / "a.png", directory / "b.png")  # duplikat a.png
+    write_image(directory / "c.png", 2)
+    checkpoint_path = tmp_path / "checkpoint.txt"
+    qdrant_client = QdrantClient(":memory:")
+    bootstrap_collection(qdrant_client, "notes", PROFILE)
+    blob_store = LocalBlobStore(str(tmp_path / "blobs"))
+    client = StubOpenAI()
+
+    # Embeddingi niedostępne: nic się nie zapisuje, a duplikat niezapisanego oryginału nie trafia do checkpointu
+    client.failing = True
+    stats = run_import(directory, client, qdrant_client, blob_store, checkpoint_path, DuplicateIndex())
+    assert (stats["saved"], stats["failed"], stats["duplicates"]) == (0, 2, 1)
+    assert checkpoint_path.read_text() == ""
+
+    # Wznowienie: oryginał zapisany, jego duplikat zapisany w checkpoincie razem z nim
+    client.failing = False
+    stats = run_import(directory, client, qdrant_client, blob_store, checkpoint_path, DuplicateIndex.from_collection(qdrant_client, "notes"))
+    assert (stats["saved"], stats["failed"], stats["duplicates"], stats["skipped"]) == (2, 0, 1, 0)
+    assert sorted(checkpoint_path.read_text().split()) == ["a.png", "b.png", "c.png"]
+    assert qdrant_client.count("notes").count == 2
+
+    # Kolejne uruchomienie pomija zapisane zdjęcia bez zapytań do API, a kopię zapisanego
+    # zdjęcia od razu oznacza jako zrobioną
+    shutil.copy(directory / "c.png", directory / "d.png")
+    captions = client.captions
+    stats = run_import(directory, client, qdrant_client, blob_store, checkpoint_path, DuplicateIndex.from_collection(qdrant_client, "notes"))
+    assert (stats["skipped"], stats["duplicates"], stats["saved"]) == (3, 1, 0)
+    assert client.captions == captions
+    assert "d.png" in checkpoint_path.read_text().split()
+    assert qdrant_client.count("notes").count == 2
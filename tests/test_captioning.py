@@ -0,0 +1,93 @@
+import time
+
+import pytest
+
+from captioning import TokenBucket, caption_images, describe_with_retries
+
+
+class FakeResponse:
+    def __init__(self, headers):
+        self.headers = headers
+
+
+class FakeAPIError(Exception):
+    def __init__(self, status_code, retry_after="0"):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+        self.response = FakeResponse({"retry-after": retry_after})
+
+
+def test_token_bucket_allows_burst_up_to_capacity():
+    bucket = TokenBucket(requests_per_minute=60, capacity=3)
+    started_at = time.monotonic()
+    for _ in range(3):
+        bucket.acquire()
+    assert time.monotonic() - started_at < 0.5
+
+
+def test_token_bucket_waits_for_refill():
+    bucket = TokenBucket(requests_per_minute=600, capacity=1)  # 10 żetonów na sekundę
+    bucket.acquire()
+    started_at = time.monotonic()
+    bucket.acquire()
+    assert time.monotonic() - started_at >= 0.05
+
+
+def test_token_bucket_pause_blocks_all_acquires():
+    bucket = TokenBucket(requests_per_minute=6000, capacity=5)
+    bucket.pause(0.2)
+    started_at = time.monotonic()
+    bucket.acquire()
+    assert time.monotonic() - started_at >= 0.15
+
+
+def test_describe_with_retries_retries_rate_limits():
+    calls = []
+
+    def describe(bytes_data, mime_type):
+        calls.append(bytes_data)
+        if len(calls) < 3:
+            raise FakeAPIError(429)
+        return "opis"
+
+    bucket = TokenBucket(requests_per_minute=6000, capacity=10)
+    assert describe_with_retries(describe, bucket, b"x", "image/jpeg", max_retries=3) == "opis"
+    assert len(calls) == 3
+
+
+def test_describe_with_retries_gives_up_after_max_retries():
+    def describe(bytes_data, mime_type):
+        raise FakeAPIError(429)
+
+    bucket = TokenBucket(requests_per_minute=6000, capacity=10)
+    with pytest.raises(FakeAPIError):
+        describe_with_retries(describe, bucket, b"x", "image/jpeg", max_retries=2)
+
+
+def test_describe_with_retries_does_not_retry_client_errors():
+    calls = []
+
+    def describe(bytes_data, mime_type):
+        calls.append(1)
+        raise FakeAPIError(400)
+
+    bucket = TokenBucket(requests_per_minute=6000, capacity=10)
+    with pytest.raises(FakeAPIError):
+        describe_with_retries(describe, bucket, b"x", "image/jpeg", max_retries=3)
+    assert len(calls) == 1
+
+
+def test_caption_images_describes_identical_images_once():
+    calls = []
+
+    def describe(bytes_data, mime_type):
+        calls.append(bytes_data)
+        if bytes_data == b"zly":
+            raise ValueError("błąd")
+        return f"opis {bytes_data.decode()}"
+
+    images = [("a.jpg", b"a", "image/jpeg"), ("b.jpg", b"a", "image/jpeg"), ("c.jpg", b"zly", "image/jpeg")]
+    descriptions, errors = caption_images(describe, images, requests_per_minute=6000)
+    assert descriptions == {"a.jpg": "opis a", "b.jpg": "opis a"}
+    assert list(errors) == ["c.jpg"]
+    assert calls.count(b"a") == 1
@@ -0,0 +1,62 @@
+from qdrant_client import QdrantClient
+from qdrant_client.models import CreateAlias, CreateAliasOperation, DeleteAlias, DeleteAliasOperation
+
+from blobstore import LocalBlobStore
+from core import NotesApp
+from profiles import create_collection, get_profile
+from search import SEARCH_MODE_SEMANTIC
+
+
+def make_app(tmp_path, qdrant_client):
+    return NotesApp(
+        qdrant_client,
+        LocalBlobStore(str(tmp_path / "blobs")),
+        "notes",
+        "text-embedding-3-large",
+        get_profile("compact"),
+        cache_dir=str(tmp_path / "cache"),
+    )
+
+
+def point_alias(qdrant_client, alias, collection_name, previous=None):
+    operations = [DeleteAliasOperation(delete_alias=DeleteAlias(alias_name=alias))] if previous else []
+    operations.append(CreateAliasOperation(create_alias=CreateAlias(collection_name=collection_name, alias_name=alias)))
+    qdrant_client.update_collection_aliases(change_aliases_operations=operations)
+
+
+def test_semantic_search_follows_alias_switched_to_another_model(tmp_path, openai_client):
+    qdrant_client = QdrantClient(":memory:")
+    create_collection(qdrant_client, "notes_large", get_profile("compact"), "text-embedding-3-large")
+    create_collection(qdrant_client, "notes_small", get_profile("balanced"), "text-embedding-3-small")
+    point_alias(qdrant_client, "notes", "notes_large")
+    app = make_app(tmp_path, qdrant_client)
+    assert app.search_note_ids(openai_client, "kot", mode=SEARCH_MODE_SEMANTIC) == ([], False)
+
+    # Przepięcie aliasu przed upływem EMBEDDING_MODEL_TTL - zapamiętany model jest już nieaktualny
+    point_alias(qdrant_client, "notes", "notes_small", previous="notes_large")
+    app.save_notes([("a.png", "pies", png_bytes(), "image/png", "")], openai_client)
+    ids, degraded = app.search_note_ids(openai_client, "pies", mode=SEARCH_MODE_SEMANTIC)
+    assert len(ids) == 1 and not degraded
+    assert app.collection_embedding() == ("text-embedding-3-small", 1536)
+    assert openai_client.embeddings.calls[-1][1:] == ("text-embedding-3-small", 1536)
+
+
+def test_search_params_follow_the_collection_not_the_configured_profile(tmp_path):
+    qdrant_client = QdrantClient(":memory:")
+    create_collection(qdrant_client, "notes", get_profile("compact"), "text-embedding-3-large")
+    app = NotesApp(qdrant_client, LocalBlobStore(str(tmp_path / "blobs")), "notes", "text-embedding-3-large", get_profile("full"), cache_dir=str(tmp_path / "cache"))
+    params = app.search_params()
+    assert params.hnsw_ef == get_profile("compact")["hnsw_ef"]
+    assert params.quantization.oversampling == get_profile("compact")["oversampling"]
+    assert app.search_params(3072) is None
+    assert app.search_params(777) is None
+
+
+def png_bytes():
+    import io
+
+    from PIL import Image
+
+    buffer = io.BytesIO()
+    Image.new("RGB", (32, 32), (200, 10, 10)).save(buffer, format="PNG")
+    return buffer.getvalue()
@@ -0,0 +1,59 @@
+import random
+
+from dedup import BKTree, DuplicateIndex, find_duplicates, format_hash, hamming, parse_hash
+
+
+def test_hash_round_trip():
+    assert parse_hash(format_hash(2 ** 64 - 1)) == 2 ** 64 - 1
+    assert format_hash(5) == "0000000000000005"
+
+
+def test_bk_tree_matches_linear_scan():
+    rng = random.Random(0)
+    values = [rng.getrandbits(64) for _ in range(300)]
+    tree = BKTree()
+    for item, value in enumerate(values):
+        tree.add(value, item)
+    query = values[17] ^ 0b1011  # 3 bity różnicy
+    expected = sorted((hamming(query, value), item) for item, value in enumerate(values) if hamming(query, value) <= 6)
+    assert sorted(tree.search(query, 6)) == expected
+    assert (3, 17) in expected
+
+
+def test_duplicate_index_find_returns_nearest():
+    index = DuplicateIndex(max_distance=4)
+    index.add("a", 0b1111)
+    index.add("b", 0b0111)
+    assert index.find(0b0111) == ("b", 0)
+    assert index.find(0b0111 ^ (1 << 40), max_distance=0) is None
+
+
+def test_duplicate_index_ignores_removed_and_replaced_items():
+    index = DuplicateIndex(max_distance=2)
+    index.add("a", 0)
+    index.add("b", 2 ** 40 - 1)
+    index.remove("a")
+    assert index.find(0) is None
+    index.add("b", 1)  # ten sam punkt z nowym hashem - stary wpis w drzewie ma zostać pominięty
+    assert index.find(2 ** 40 - 1) is None
+    assert index.find(0) == ("b", 1)
+    assert len(index) == 1
+
+
+def test_claim_adds_only_first_of_near_duplicates():
+    index = DuplicateIndex(max_distance=2)
+    assert index.claim("a", 0b1000) is None
+    assert index.claim("b", 0b1001) == ("a", 1)
+    assert len(index) == 1
+    index.remove("a")
+    assert index.claim("b", 0b1001) is None
+
+
+def test_find_duplicates_checks_saved_and_batch_images():
+    saved = DuplicateIndex()
+    saved.add("id-1", 0)
+    images = [("x.jpg", 1), ("y.jpg", 2 ** 40 - 1), ("z.jpg", 2 ** 40 - 1)]
+    assert find_duplicates(images, saved) == {
+        "x.jpg": ("id-1", 1, True),
+        "z.jpg": ("y.jpg", 0, False),
+    }
@@ -0,0 +1,68 @@
+import uuid
+from types import SimpleNamespace
+
+from qdrant_client import QdrantClient
+from qdrant_client.models import PointStruct
+
+from conftest import StubEmbeddings
+from core import bootstrap_collection
+from ingest import bulk_add_notes, bulk_delete_notes
+from profiles import get_profile
+
+PROFILE = get_profile("compact")
+
+
+class ApiError(Exception):
+    # Jak błędy openai: kod odpowiedzi w status_code
+    def __init__(self, status_code):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+
+
+class FailingEmbeddings(StubEmbeddings):
+    # Zapytanie z tekstem "zły" kończy się błędem o podanym kodzie
+    def __init__(self, status_code):
+        super().__init__()
+        self.status_code = status_code
+
+    def create(self, input, model, dimensions=None):
+        if "zły" in input:
+            self.calls.append((list(input), model, dimensions))
+            raise ApiError(self.status_code)
+        return super().create(input, model, dimensions)
+
+
+def add_notes(status_code):
+    qdrant_client = QdrantClient(":memory:")
+    bootstrap_collection(qdrant_client, "notes", PROFILE)
+    client = SimpleNamespace(embeddings=FailingEmbeddings(status_code))
+    notes = [(name, {"text": name}) for name in ("a", "zły", "b")]
+    saved, failed = bulk_add_notes(qdrant_client, "notes", client, notes, "text-embedding-3-small", dimensions=PROFILE["dimensions"])
+    return client.embeddings.calls, saved, failed
+
+
+def test_bad_request_retries_texts_one_by_one():
+    calls, saved, failed = add_notes(400)
+    assert [texts for texts, _, _ in calls] == [["a", "zły", "b"], ["a"], ["zły"], ["b"]]
+    assert set(saved) == {"a", "b"}
+    assert set(failed) == {"zły"}
+
+
+def test_other_errors_fail_whole_chunk_without_retries():
+    for status_code in (429, 500, None):
+        calls, saved, failed = add_notes(status_code)
+        assert len(calls) == 1
+        assert saved == {}
+        assert set(failed) == {"a", "zły", "b"}
+
+
+def test_delete_accepts_integer_and_uuid_ids():
+    qdrant_client = QdrantClient(":memory:")
+    bootstrap_collection(qdrant_client, "notes", PROFILE)
+    vector = [1.0] * PROFILE["dimensions"]
+    point_id = str(uuid.uuid4())
+    qdrant_client.upsert("notes", [PointStruct(id=5, vector=vector, payload={}), PointStruct(id=point_id, vector=vector, payload={})])
+    deleted, missing = bulk_delete_notes(qdrant_client, "notes", ids=[5, point_id, 7])
+    assert sorted(map(str, deleted)) == sorted(["5", point_id])
+    assert missing == [7]
+    assert qdrant_client.count("notes").count == 0
@@ -0,0 +1,62 @@
+from lexical import BM25Index, tokenize
+from search import hybrid_search, reciprocal_rank_fusion
+
+
+def make_index():
+    index = BM25Index()
+    index.add(1, "Kot śpi na kanapie")
+    index.add(2, "Dwa koty bawią się kłębkiem")
+    index.add(3, "Pies biegnie po plaży")
+    return index
+
+
+def test_tokenize_lowercases_and_splits_on_punctuation():
+    assert tokenize("Kot, PIES; żółw!") == ["kot", "pies", "żółw"]
+
+
+def test_search_ranks_matching_documents():
+    assert make_index().search("pies") == [3]
+
+
+def test_prefix_expansion_matches_inflected_forms():
+    assert set(make_index().search("kot")) == {1, 2}
+
+
+def test_short_terms_are_not_expanded():
+    index = make_index()
+    index.add(4, "na")
+    assert index.search("n") == []
+    assert set(index.search("na")) == {1, 4}
+
+
+def test_remove_and_readd_update_results():
+    index = make_index()
+    index.remove(3)
+    assert index.search("pies") == []
+    index.add(1, "Pies na kanapie")
+    assert index.search("pies") == [1]
+    assert index.search("śpi") == []
+    assert len(index) == 2
+
+
+def test_reciprocal_rank_fusion_prefers_documents_in_both_rankings():
+    assert reciprocal_rank_fusion([["a", "b", "c"], ["c", "d"]])[0] == "c"
+
+
+def test_reciprocal_rank_fusion_merges_ids_of_different_types():
+    # ID z Qdranta i z indeksu słów kluczowych porównujemy jako tekst
+    assert [str(doc_id) for doc_id in reciprocal_rank_fusion([[1, 2], ["1"]])] == ["1", "2"]
+
+
+def test_hybrid_search_falls_back_to_keywords_when_dense_search_fails():
+    def dense_search():
+        raise RuntimeError("brak sieci")
+
+    assert hybrid_search(["a", "b"], dense_search, limit=1) == (["a"], True)
+
+
+def test_hybrid_search_fuses_rankings():
+    ids, degraded = hybrid_search(["a", "b"], lambda: ["b", "c"], limit=3)
+    assert not degraded
+    assert ids[0] == "b"
+    assert set(ids) == {"a", "b", "c"}
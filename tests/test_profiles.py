@@ -0,0 +1,41 @@
+from qdrant_client import QdrantClient
+from qdrant_client.models import PointStruct
+
+from profiles import DEFAULT_SOURCE_MODEL, collection_embedding, create_collection, get_profile, migrate_collection
+from reembed import alias_target, switch_collection, sync_shortened
+
+
+def make_legacy_collection(count):
+    # Kolekcja sprzed zapisywania modelu w metadanych
+    qdrant_client = QdrantClient(":memory:")
+    create_collection(qdrant_client, "notes", get_profile("balanced"))
+    add_points(qdrant_client, "notes", range(count))
+    return qdrant_client
+
+
+def add_points(qdrant_client, collection_name, ids):
+    qdrant_client.upsert(collection_name, [
+        PointStruct(id=point_id, vector=[(point_id + 1) / (i + 1) for i in range(1536)], payload={"text": f"opis {point_id}"})
+        for point_id in ids
+    ])
+
+
+def test_migrate_legacy_collection_records_default_model():
+    qdrant_client = make_legacy_collection(10)
+    assert migrate_collection(qdrant_client, "notes", "notes_compact", get_profile("compact"), batch_size=4) == 10
+    assert collection_embedding(qdrant_client, "notes_compact", None) == (DEFAULT_SOURCE_MODEL, 1024)
+
+
+def test_migrated_collection_takes_over_alias_with_late_points():
+    qdrant_client = make_legacy_collection(10)
+    migrate_collection(qdrant_client, "notes", "notes_compact", get_profile("compact"))
+    add_points(qdrant_client, "notes", [10, 11])  # Zapisane po migracji, przed przepięciem
+
+    def sync(source, delete_extra):
+        return sync_shortened(qdrant_client, source, "notes_compact", 1024, delete_extra=delete_extra)
+
+    previous, added, removed = switch_collection(qdrant_client, "notes", "notes_compact", sync, log=lambda message: None)
+    assert (previous, added, removed) == ("notes_text_embedding_3_large", 2, 0)
+    assert alias_target(qdrant_client, "notes") == "notes_compact"
+    assert qdrant_client.count("notes").count == 12
+    assert len(qdrant_client.retrieve("notes", [11], with_vectors=True)[0].vector) == 1024
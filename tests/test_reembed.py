@@ -0,0 +1,152 @@
+import pytest
+from qdrant_client import QdrantClient
+from qdrant_client.models import PointStruct
+
+from profiles import collection_embedding, create_collection, get_profile
+from reembed import ReembedState, adopt_collection, alias_target, copy_collection, switch_alias, switch_collection, sync_collections
+
+PROFILE = get_profile("compact")
+
+
+def add_points(qdrant_client, collection_name, ids):
+    qdrant_client.upsert(collection_name, [
+        PointStruct(id=point_id, vector=[0.1 * (point_id % 7 + 1)] * PROFILE["dimensions"], payload={"text": f"opis {point_id}"})
+        for point_id in ids
+    ])
+
+
+class RecreatingClient:
+    # Udaje aplikację, która po usunięciu kolekcji zakłada ją od nowa (assure_db_collection_exists)
+    # i zapisuje do niej notatkę, zanim powstanie alias
+    def __init__(self, qdrant_client, collection_name, point_id):
+        self.qdrant_client = qdrant_client
+        self.collection_name = collection_name
+        self.point_id = point_id
+
+    def __getattr__(self, name):
+        return getattr(self.qdrant_client, name)
+
+    def delete_collection(self, collection_name):
+        result = self.qdrant_client.delete_collection(collection_name)
+        if collection_name == self.collection_name and self.point_id is not None:
+            create_collection(self.qdrant_client, collection_name, PROFILE)
+            add_points(self.qdrant_client, collection_name, [self.point_id])
+            self.point_id = None
+        return result
+
+
+def test_adopt_collection_keeps_points_from_collection_recreated_before_alias():
+    qdrant_client = QdrantClient(":memory:")
+    create_collection(qdrant_client, "notes", PROFILE)
+    add_points(qdrant_client, "notes", range(10))
+
+    kept = adopt_collection(RecreatingClient(qdrant_client, "notes", 99), "notes", "notes_backup", "text-embedding-3-large")
+    assert kept == 11
+    assert alias_target(qdrant_client, "notes") == "notes_backup"
+    assert "notes" not in [description.name for description in qdrant_client.get_collections().collections]
+    assert collection_embedding(qdrant_client, "notes", None) == ("text-embedding-3-large", PROFILE["dimensions"])
+
+
+def test_adopt_collection_resumes_after_original_was_deleted():
+    qdrant_client = QdrantClient(":memory:")
+    create_collection(qdrant_client, "notes_backup", PROFILE, "text-embedding-3-large")
+    add_points(qdrant_client, "notes_backup", range(5))
+
+    assert adopt_collection(qdrant_client, "notes", "notes_backup", "text-embedding-3-large") == 5
+    assert alias_target(qdrant_client, "notes") == "notes_backup"
+
+
+class Interrupted(Exception):
+    pass
+
+
+def interrupt_after(batches):
+    # log wywoływany po zapisaniu stanu każdej partii - wyjątek udaje przerwane kopiowanie
+    logged = []
+
+    def log(message):
+        logged.append(message)
+        if len(logged) == batches:
+            raise Interrupted()
+
+    return log
+
+
+def all_ids(qdrant_client, collection_name):
+    points, _ = qdrant_client.scroll(collection_name, limit=1000, with_payload=False, with_vectors=False)
+    return sorted(point.id for point in points)
+
+
+def test_copy_collection_resumes_from_state_file(tmp_path, openai_client):
+    qdrant_client = QdrantClient(":memory:")
+    create_collection(qdrant_client, "notes", PROFILE)
+    add_points(qdrant_client, "notes", range(10))
+    state_path = str(tmp_path / "state.json")
+
+    with pytest.raises(Interrupted):
+        copy_collection(qdrant_client, openai_client, "notes", "notes_small", "text-embedding-3-small", PROFILE, state_path, batch_size=4, log=interrupt_after(1))
+    assert len(all_ids(qdrant_client, "notes_small")) == 4
+    embedded_before = [text for texts, _, _ in openai_client.embeddings.calls for text in texts]
+
+    copied = copy_collection(qdrant_client, openai_client, "notes", "notes_small", "text-embedding-3-small", PROFILE, state_path, batch_size=4, log=lambda message: None)
+    assert copied == 10
+    assert all_ids(qdrant_client, "notes_small") == list(range(10))
+    embedded_after = [text for texts, _, _ in openai_client.embeddings.calls for text in texts][len(embedded_before):]
+    # Wznowienie nie liczy od nowa embeddingów z pierwszej partii
+    assert len(embedded_after) == 6
+    assert collection_embedding(qdrant_client, "notes_small", None) == ("text-embedding-3-small", PROFILE["dimensions"])
+    # Zakończona migracja z tym samym plikiem stanu niczego już nie kopiuje
+    calls = len(openai_client.embeddings.calls)
+    assert copy_collection(qdrant_client, openai_client, "notes", "notes_small", "text-embedding-3-small", PROFILE, state_path) == 10
+    assert len(openai_client.embeddings.calls) == calls
+
+
+def test_reembed_state_rejects_other_migration(tmp_path):
+    state_path = str(tmp_path / "state.json")
+    ReembedState(state_path, "notes", "notes_small", "text-embedding-3-small").save()
+    with pytest.raises(ValueError):
+        ReembedState(state_path, "notes", "notes_large", "text-embedding-3-large")
+
+
+def test_sync_collections_adds_new_and_removes_deleted_points(openai_client):
+    qdrant_client = QdrantClient(":memory:")
+    create_collection(qdrant_client, "notes_old", PROFILE)
+    create_collection(qdrant_client, "notes_new", PROFILE, "text-embedding-3-small")
+    add_points(qdrant_client, "notes_old", range(5))
+    add_points(qdrant_client, "notes_new", [0, 1, 2, 42])
+
+    added, removed = sync_collections(qdrant_client, openai_client, "notes_old", "notes_new", "text-embedding-3-small", PROFILE["dimensions"])
+    assert (added, removed) == (2, 1)
+    assert all_ids(qdrant_client, "notes_new") == list(range(5))
+    assert sorted(text for texts, _, _ in openai_client.embeddings.calls for text in texts) == ["opis 3", "opis 4"]
+
+
+def test_switch_collection_adopts_plain_collection_and_syncs(tmp_path, openai_client):
+    qdrant_client = QdrantClient(":memory:")
+    create_collection(qdrant_client, "notes", PROFILE, "text-embedding-3-large")
+    add_points(qdrant_client, "notes", range(6))
+    copy_collection(qdrant_client, openai_client, "notes", "notes_small", "text-embedding-3-small", PROFILE, str(tmp_path / "state.json"), log=lambda message: None)
+    # Notatka zapisana po skopiowaniu musi trafić do nowej kolekcji przy przełączeniu
+    add_points(qdrant_client, "notes", [6])
+
+    def sync(source, delete_extra):
+        return sync_collections(qdrant_client, openai_client, source, "notes_small", "text-embedding-3-small", PROFILE["dimensions"], delete_extra=delete_extra)
+
+    previous, added, removed = switch_collection(qdrant_client, "notes", "notes_small", sync, log=lambda message: None)
+    assert (previous, added, removed) == ("notes_text_embedding_3_large", 1, 0)
+    assert alias_target(qdrant_client, "notes") == "notes_small"
+    assert all_ids(qdrant_client, "notes") == list(range(7))
+    assert all_ids(qdrant_client, "notes_text_embedding_3_large") == list(range(7))
+    assert collection_embedding(qdrant_client, "notes", None)[0] == "text-embedding-3-small"
+
+    # Powrót na poprzednią kolekcję to zwykłe przepięcie aliasu
+    assert switch_alias(qdrant_client, "notes", previous) == "notes_small"
+    assert alias_target(qdrant_client, "notes") == previous
+
+
+def test_switch_alias_refuses_plain_collection():
+    qdrant_client = QdrantClient(":memory:")
+    create_collection(qdrant_client, "notes", PROFILE)
+    create_collection(qdrant_client, "notes_small", PROFILE)
+    with pytest.raises(ValueError):
+        switch_alias(qdrant_client, "notes", "notes_small")
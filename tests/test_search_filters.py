@@ -0,0 +1,67 @@
+from qdrant_client import QdrantClient
+from qdrant_client.models import PointStruct
+
+from core import bootstrap_collection
+from ingest import backfill_payload
+from profiles import get_profile
+from search import build_filter, filter_ids, filter_key
+
+PROFILE = get_profile("compact")
+
+
+def make_collection():
+    qdrant_client = QdrantClient(":memory:")
+    bootstrap_collection(qdrant_client, "notes", PROFILE)
+    vector = [1.0] * PROFILE["dimensions"]
+    qdrant_client.upsert("notes", [
+        PointStruct(id=1, vector=vector, payload={"text": "a", "uploaded_at": 100, "tags": ["morze"], "source": "app"}),
+        PointStruct(id=2, vector=vector, payload={"text": "b", "uploaded_at": 200, "tags": ["góry"], "source": "import"}),
+        PointStruct(id=3, vector=vector, payload={"text": "c", "uploaded_at": 300, "tags": ["morze", "góry"], "source": "app"}),
+    ])
+    return qdrant_client
+
+
+def test_build_filter_without_conditions_is_none():
+    assert build_filter(None) is None
+    assert build_filter({"tags": [], "source": None}) is None
+
+
+def test_filter_key_ignores_empty_values_and_order():
+    assert filter_key({"tags": ["a", "b"], "source": None}) == filter_key({"source": "", "tags": ("a", "b")})
+    assert filter_key({"tags": ["a"]}) != filter_key({"tags": ["b"]})
+    assert filter_key(None) == ()
+
+
+def test_filter_ids_keeps_order_and_matching_points():
+    qdrant_client = make_collection()
+    points_filter = build_filter({"tags": ["morze"]})
+    assert filter_ids(qdrant_client, "notes", [3, 2, 1], points_filter) == [3, 1]
+
+
+def test_filters_combine_date_range_and_source():
+    qdrant_client = make_collection()
+    points_filter = build_filter({"uploaded_after": 150, "uploaded_before": 300, "source": "app"})
+    assert filter_ids(qdrant_client, "notes", [1, 2, 3], points_filter) == [3]
+
+
+def test_bootstrap_backfills_notes_without_metadata():
+    qdrant_client = make_collection()
+    qdrant_client.upsert("notes", [PointStruct(id=4, vector=[1.0] * PROFILE["dimensions"], payload={"text": "stara"})])
+    bootstrap_collection(qdrant_client, "notes", PROFILE)
+    assert filter_ids(qdrant_client, "notes", [1, 4], build_filter({"source": "app"})) == [1, 4]
+    assert filter_ids(qdrant_client, "notes", [4], build_filter({"uploaded_before": 50})) == [4]
+
+
+def test_backfill_writes_only_when_fields_are_missing():
+    qdrant_client = make_collection()
+    qdrant_client.upsert("notes", [PointStruct(id=4, vector=[1.0] * PROFILE["dimensions"], payload={"text": "stara"})])
+    assert backfill_payload(qdrant_client, "notes") == 2
+
+    class NoWrites:
+        def __getattr__(self, name):
+            return getattr(qdrant_client, name)
+
+        def set_payload(self, **kwargs):
+            raise AssertionError("set_payload bez brakujących pól")
+
+    assert backfill_payload(NoWrites(), "notes") == 0
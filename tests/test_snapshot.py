@@ -0,0 +1,86 @@
+import random
+import uuid
+
+from qdrant_client import QdrantClient
+from qdrant_client.models import PointStruct
+
+from blobstore import LocalBlobStore, QdrantBlobStore, make_blob_store
+from profiles import collection_embedding, create_collection, get_profile
+from snapshot import dump_collection, export_blobs, export_collection, import_blobs, import_collection, missing_blobs, restore_collection
+
+PROFILE = get_profile("compact")
+
+
+def make_collection(count=50):
+    qdrant_client = QdrantClient(":memory:")
+    create_collection(qdrant_client, "notes", PROFILE, embedding_model="text-embedding-3-small")
+    rng = random.Random(0)
+    qdrant_client.upsert("notes", [
+        PointStruct(
+            id=str(uuid.UUID(int=rng.getrandbits(128))),
+            vector=[rng.random() for _ in range(PROFILE["dimensions"])],
+            payload={"text": f"notatka {i}", "image_hash": f"{i:064x}", "tags": ["test"]},
+        )
+        for i in range(count)
+    ])
+    return qdrant_client
+
+
+def all_points(qdrant_client, collection_name):
+    points, _ = qdrant_client.scroll(collection_name, limit=1000, with_payload=True, with_vectors=True)
+    return {point.id: point for point in points}
+
+
+def assert_same_points(qdrant_client, source, target):
+    expected = all_points(qdrant_client, source)
+    restored = all_points(qdrant_client, target)
+    assert restored.keys() == expected.keys()
+    for point_id, point in expected.items():
+        assert restored[point_id].payload == point.payload
+        assert max(abs(a - b) for a, b in zip(restored[point_id].vector, point.vector)) < 1e-6
+
+
+def test_export_import_round_trip(tmp_path):
+    qdrant_client = make_collection()
+    assert export_collection(qdrant_client, "notes", str(tmp_path), batch_size=16) == 50
+    assert import_collection(qdrant_client, str(tmp_path), "copy", batch_size=16, max_workers=1) == ("copy", 50)
+    assert_same_points(qdrant_client, "notes", "copy")
+    assert collection_embedding(qdrant_client, "copy", None) == ("text-embedding-3-small", PROFILE["dimensions"])
+
+
+def test_missing_blobs_lists_keys_absent_from_store(tmp_path):
+    qdrant_client = make_collection(count=3)
+    export_collection(qdrant_client, "notes", str(tmp_path / "archive"))
+    blob_store = LocalBlobStore(str(tmp_path / "blobs"))
+    assert len(missing_blobs(str(tmp_path / "archive"), blob_store)) == 3
+
+
+def test_export_import_copies_blob_bytes_between_stores(tmp_path):
+    qdrant_client = QdrantClient(":memory:")
+    create_collection(qdrant_client, "notes", PROFILE, embedding_model="text-embedding-3-small")
+    source = LocalBlobStore(str(tmp_path / "blobs"))
+    images = [f"zdjęcie {i}".encode() for i in range(3)]
+    qdrant_client.upsert("notes", [
+        PointStruct(id=i, vector=[0.1] * PROFILE["dimensions"], payload={"text": "x", "image_hash": source.put(data)})
+        for i, data in enumerate(images)
+    ])
+    archive = str(tmp_path / "archive")
+    export_collection(qdrant_client, "notes", archive)
+    assert export_blobs(archive, source) == (3, [])
+
+    target = QdrantBlobStore(QdrantClient(":memory:"), "note_blobs")
+    assert import_blobs(archive, target) == (3, [])
+    assert sorted(target.get(key) for key in (source.put(data) for data in images)) == sorted(images)
+    assert import_blobs(archive, target) == (0, [])
+
+
+def test_make_blob_store_picks_directory_for_local_client(tmp_path):
+    assert isinstance(make_blob_store(QdrantClient(":memory:"), str(tmp_path)), LocalBlobStore)
+
+
+def test_dump_restore_round_trip(tmp_path):
+    qdrant_client = make_collection(count=20)
+    path = str(tmp_path / "notes.snap.gz")
+    assert dump_collection(qdrant_client, "notes", path, batch_size=8) == 20
+    assert restore_collection(qdrant_client, path, "copy") == ("copy", 20)
+    assert_same_points(qdrant_client, "notes", "copy")
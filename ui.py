@@ -0,0 +1,202 @@
+import datetime
+import os
+
+import streamlit as st
+
+from clients import create_openai_client
+from imaging import image_dhash
+from ingest import SOURCE_APP, SOURCE_IMPORT, EmbeddingError
+from jobs import JOB_DONE
+from metrics import REGISTRY, start_http_server, timed
+from search import SEARCH_MODE_HYBRID
+
+# Elementy interfejsu wspólne dla gotowe.py i v1.py; logika bez Streamlita jest w core.NotesApp
+
+OPENAI_TIMEOUT = 60.0  # Limit czasu jednego zapytania do OpenAI (sekundy)
+OPENAI_MAX_RETRIES = 4  # Ponowienia przy 429/5xx, z uwzględnieniem Retry-After
+JOB_POLL_INTERVAL = 2  # Co ile sekund zakładka "Dodaj zdjęcie" sprawdza zadania w tle
+METRICS_PORT = os.getenv("METRICS_PORT")  # Jeśli ustawiony, metryki są pod http://host:port/metrics
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")  # Endpoint nie ma uwierzytelniania; "0.0.0.0" wystawia go na zewnątrz
+
+
+# Jeden klient na klucz API dla wszystkich sesji i przebiegów skryptu - połączenia są ponownie używane
+@st.cache_resource
+def get_openai_client(api_key):
+    return create_openai_client(api_key, timeout=OPENAI_TIMEOUT, max_retries=OPENAI_MAX_RETRIES)
+
+
+@st.cache_resource
+def get_metrics_server():
+    return start_http_server(int(METRICS_PORT), host=METRICS_HOST) if METRICS_PORT else None
+
+
+def show_image(image, **kwargs):
+    with timed("render_image"):
+        st.image(image, **kwargs)
+
+
+# Postęp zadań w tle; fragment odświeża się sam, reszta strony zostaje bez zmian.
+# gallery_key: klucz sesji z notatkami galerii, które po zapisie trzeba wczytać od nowa.
+@st.fragment(run_every=JOB_POLL_INTERVAL)
+def show_ingest_jobs(app, gallery_key):
+    refresh = False
+    for job_id, kind in st.session_state.ingest_jobs:
+        job = app.jobs.get(job_id)
+        if job is None:
+            continue
+        status = job.snapshot()
+        st.progress(status["done"] / max(status["total"], 1), text=f"{status['name']}: {status['done']}/{status['total']}")
+        for name, error in status["errors"].items():
+            st.error(f"{name}: {error}")
+        if status["error"]:
+            st.error(f"{status['name']}: {status['error']}")
+        elif status["status"] == JOB_DONE and not status["errors"]:
+            st.success(f"{status['name']}: gotowe.")
+        if job.finished and job_id not in st.session_state.applied_jobs:
+            st.session_state.applied_jobs.add(job_id)
+            if kind == "caption":
+                for name, description in (job.result or {}).items():
+                    st.session_state[f"note_text_{name}"] = description
+            else:
+                st.session_state.pop(gallery_key, None)  # Galeria wczyta się od nowa
+            refresh = True
+    if refresh:
+        st.rerun()
+
+
+def find_upload_duplicates(app, uploaded_files):
+    # Hash liczymy raz na plik i trzymamy go w sesji; słownik nazwa -> (oryginał, różnica, czy zapisany)
+    hashes = []
+    for uploaded_file in uploaded_files:
+        hash_key = f"dhash_{uploaded_file.file_id}"
+        if hash_key not in st.session_state:
+            st.session_state[hash_key] = image_dhash(uploaded_file.getvalue())
+        hashes.append((uploaded_file.name, st.session_state[hash_key]))
+    return app.find_duplicates(hashes)
+
+
+def skipped_as_duplicate(name, duplicates):
+    return name in duplicates and not st.session_state.get(f"keep_duplicate_{name}")
+
+
+def show_duplicate_warning(name, duplicate):
+    original, distance, saved = duplicate
+    where = f"z zapisanym zdjęciem ID {original}" if saved else f"ze zdjęciem {original}"
+    st.warning(f"To zdjęcie jest prawie identyczne {where} (różnica {distance}/64). Pomijamy je przy opisie i zapisie.")
+    st.checkbox("Zapisz mimo to", key=f"keep_duplicate_{name}")
+
+
+def list_notes_from_db(app, client, query=None, mode=SEARCH_MODE_HYBRID, filters=None):
+    try:
+        notes, degraded = app.list_notes(client, query, mode=mode, filters=filters)
+    except EmbeddingError as e:
+        st.error(str(e))
+        return []
+    except Exception as e:
+        # Np. niedostępny Qdrant w trybie "Tylko semantyczne", gdzie nie ma wyników zapasowych
+        print(f"Błąd wyszukiwania: {e}")
+        st.error(f"Wyszukiwanie nie powiodło się: {e}")
+        return []
+    if degraded:
+        st.info("Wyszukiwanie semantyczne jest chwilowo niedostępne - pokazuję wyniki po słowach kluczowych.")
+    return notes
+
+
+# "Więcej takich" w galerii; kolejne zdjęcia można oznaczać jako bardziej lub mniej pasujące
+def show_similar_notes(app, similar):
+    st.subheader("Podobne zdjęcia")
+    if st.button("Zamknij podobne"):
+        del st.session_state["similar_to"]
+        st.rerun()
+    try:
+        notes = app.notes_by_ids(app.similar_note_ids(similar["positive"], similar["negative"]))
+    except Exception as e:
+        # Np. zdjęcie-przykład zostało w międzyczasie usunięte
+        st.error(f"Nie udało się znaleźć podobnych zdjęć: {e}")
+        return
+    if not notes:
+        st.write("Brak podobnych zdjęć.")
+        return
+    cols = st.columns(3)
+    for i, note in enumerate(notes):
+        with cols[i % 3]:
+            image = app.load_note_image(note)
+            if image:
+                show_image(image, width=150)
+                if st.button("Bardziej takie", key=f"similar_more_{note['id']}"):
+                    similar["positive"].append(note["id"])
+                    st.rerun()
+                if st.button("Mniej takie", key=f"similar_less_{note['id']}"):
+                    similar["negative"].append(note["id"])
+                    st.rerun()
+    st.markdown("---")
+
+
+def list_known_tags(app):
+    try:
+        return app.list_known_tags()
+    except Exception as e:
+        print(f"Nie udało się pobrać listy tagów: {e}")
+        return []
+
+
+def day_timestamp(day, end=False):
+    if day is None:
+        return None
+    return int(datetime.datetime.combine(day, datetime.time.max if end else datetime.time.min).timestamp())
+
+
+def show_search_filters(app):
+    # Zwraca słownik filtrów dla list_notes_from_db
+    sources = {"Wszystkie": None, "Dodane w aplikacji": SOURCE_APP, "Import z katalogu": SOURCE_IMPORT}
+    with st.expander("Filtry"):
+        tags = st.multiselect("Tagi (dowolny z wybranych)", list_known_tags(app))
+        uploaded_after = st.date_input("Dodane od", value=None)
+        uploaded_before = st.date_input("Dodane do", value=None)
+        source = st.selectbox("Źródło", list(sources))
+    return {
+        "tags": tags,
+        "uploaded_after": day_timestamp(uploaded_after),
+        "uploaded_before": day_timestamp(uploaded_before, end=True),
+        "source": sources[source],
+    }
+
+
+def without_notes(notes, note_ids):
+    # Aktualizacja galerii w sesji po usunięciu, bez ponownego pobierania z bazy
+    removed = {str(note_id) for note_id in note_ids}
+    return [note for note in notes if str(note["id"]) not in removed]
+
+
+def delete_note_from_db(app, note_id):
+    try:
+        note_id_str = str(note_id)
+        print(f"Próbuję usunąć notatkę o ID: {note_id_str}")
+
+        # Sprawdzenie istnienia po ID, bez pobierania całej galerii
+        deleted, _ = app.delete_notes([note_id])
+        if not deleted:
+            st.warning(f"Notatka o ID {note_id_str} nie istnieje w bazie danych.")
+            return False
+
+        st.success(f"Notatka o ID {note_id_str} została usunięta.")
+
+        print(f"Notatka o ID {note_id_str} została pomyślnie usunięta.")
+        return True
+    except Exception as e:
+        print(f"Wystąpił błąd podczas usuwania notatki o ID {note_id}: {e}")
+        st.error(f"Wystąpił błąd podczas usuwania notatki: {e}")
+        return False
+
+
+# Panel diagnostyczny: czasy etapów, rozmiary danych i tokeny
+def show_metrics_panel(app):
+    with st.sidebar.expander("Diagnostyka", expanded=True):
+        rows = REGISTRY.summary()
+        if rows:
+            st.dataframe(rows, hide_index=True)
+        else:
+            st.write("Brak pomiarów.")
+        st.caption(f"Cache opisów: {app.caption_cache.stats()}")
+        st.caption(f"Cache embeddingów: {app.embedding_cache.stats()}")
+        st.download_button("Pobierz metryki (OpenMetrics)", REGISTRY.to_openmetrics(), file_name="metrics.txt", mime="text/plain")